@@ -1,13 +1,18 @@
+import json
 from ckeditor_uploader.widgets import CKEditorUploadingWidget
+from django import forms
+from django.conf import settings
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
-from django import forms
+from django.http import Http404, HttpResponseRedirect, JsonResponse
+from django.template.response import TemplateResponse
 from django.urls import path
+from django.utils import timezone
+from . import exports, media, profiling
+from .caching import cache_stats
+from .dao import get_posts_by_year, get_users_by_year, get_posts_by_month, get_post_stats, get_user_stats
+from .forms import YearForm, StatsRangeForm, UserStatsRangeForm
 from .models import User, Post, Like, Comment, Membership, Survey, Question, Answer, PostType, LikeType
-from .dao import get_posts_by_year, get_users_by_year, get_posts_by_month
-from django.template.response import TemplateResponse
-import json
-from .forms import YearForm
 
 # from adminplus.sites import register_view
 
@@ -48,9 +53,85 @@ class SocialMediaAppAdminSite(admin.AdminSite):
         return [
             path('posts-by-year-stats/', self.admin_view(self.posts_by_year_stats_view)),
             path('users-by-year-stats/', self.admin_view(self.users_by_year_stats_view)),
-            path('posts-by-month-stats/', self.admin_view(self.posts_by_month_stats_view))
+            path('posts-by-month-stats/', self.admin_view(self.posts_by_month_stats_view)),
+            path('post-stats/', self.admin_view(self.post_stats_view)),
+            path('user-stats/', self.admin_view(self.user_stats_view)),
+            path('cache-stats/', self.admin_view(self.cache_stats_view)),
+            path('endpoint-stats/', self.admin_view(self.endpoint_stats_view)),
+            path('export/<str:name>/', self.admin_view(self.export_view))
         ] + super().get_urls()
 
+    # tải toàn bộ bảng dạng stream, ?format=csv|jsonl
+    def export_view(self, request, name):
+        fmt = request.GET.get('format', 'csv')
+        if name not in exports.EXPORTS or fmt not in exports.FORMATS:
+            raise Http404
+        return exports.streaming_response(name, fmt)
+
+    # thống kê bài đăng theo khoảng ngày, độ chi tiết và loại bài/nhóm
+    def post_stats_view(self, request):
+        stats_form = StatsRangeForm(request.GET or None)
+        post_stats = []
+
+        if stats_form.is_valid():
+            data = stats_form.cleaned_data
+            post_stats = get_post_stats(data['start'], data['end'], granularity=data['granularity'],
+                                        breakdown=data['breakdown'] or None)
+
+        return TemplateResponse(request, 'admin/stats_posts_range_view.html', {
+            'stats_form': stats_form,
+            'post_stats': post_stats
+        })
+
+    # số user mới theo khoảng ngày, độ chi tiết và nhóm
+    def user_stats_view(self, request):
+        stats_form = UserStatsRangeForm(request.GET or None)
+        user_stats = []
+
+        if stats_form.is_valid():
+            data = stats_form.cleaned_data
+            user_stats = get_user_stats(data['start'], data['end'], granularity=data['granularity'],
+                                        breakdown=data['breakdown'] or None)
+
+        return TemplateResponse(request, 'admin/stats_users_range_view.html', {
+            'stats_form': stats_form,
+            'user_stats': user_stats
+        })
+
+    # số hit/miss của từng policy cache và của cache URL ảnh
+    def cache_stats_view(self, request):
+        stats = cache_stats(settings.RESPONSE_CACHE_POLICIES)
+        stats['image_urls'] = media.url_cache_info()
+        return JsonResponse(stats)
+
+    # số query, thời gian DB/serialize, kích thước response theo view action (profiling.py) của process này,
+    # POST để xoá số đo
+    def endpoint_stats_view(self, request):
+        if request.method == 'POST':
+            profiling.reset()
+            return HttpResponseRedirect(request.path)
+
+        views = profiling.snapshot()
+        rows = []
+        for item in views:
+            metrics = item['metrics']
+            rows.append({
+                'view': item['view'],
+                'requests': item['requests'],
+                'latency': [_ms(metrics['latency_seconds'][q]) for q in ('p50', 'p95', 'p99')],
+                'avg_queries': metrics['queries']['avg'],
+                'p95_queries': metrics['queries']['p95'],
+                'avg_db_ms': _ms(metrics['db_seconds']['avg']),
+                'avg_serializer_ms': _ms(metrics['serializer_seconds']['avg']),
+                'avg_kb': metrics['response_bytes']['avg'] / 1024 if metrics['response_bytes']['count'] else None,
+                'histogram': _bucket_counts(metrics['latency_seconds']['buckets']),
+            })
+
+        return TemplateResponse(request, 'admin/endpoint_stats_view.html', {
+            'rows': rows,
+            'latency_bounds': [_ms(le) for le in profiling.BUCKETS['latency_seconds']],
+        })
+
     def posts_by_year_stats_view(self, request):
         posts_by_year_stats = get_posts_by_year()
 
@@ -75,7 +156,7 @@ class SocialMediaAppAdminSite(admin.AdminSite):
             posts_by_month = get_posts_by_month(year=selected_year)
         else:
             # Nếu không có năm nào được chọn, mặc định hiển thị cho năm hiện tại
-            posts_by_month = get_posts_by_month()
+            posts_by_month = get_posts_by_month(year=timezone.now().year)
 
         # Chuyển đổi dữ liệu sang định dạng JSON
         posts_by_month_json = json.dumps(list(posts_by_month))
@@ -86,6 +167,29 @@ class SocialMediaAppAdminSite(admin.AdminSite):
         })
 
 
+def _ms(seconds):
+    return seconds * 1000 if seconds is not None else None
+
+
+# histogram lưu dạng cộng dồn (như Prometheus), trang admin hiện số request của từng bucket
+def _bucket_counts(cumulative):
+    counts = []
+    previous = 0
+    for _, total in cumulative:
+        counts.append(total - previous)
+        previous = total
+    return counts
+
+
+# action xuất các dòng được chọn trong trang danh sách của admin
+def export_action(name, fmt, to_queryset=lambda queryset: queryset):
+    def action(modeladmin, request, queryset):
+        return exports.streaming_response(name, fmt, to_queryset(queryset))
+    action.__name__ = 'export_%s_%s' % (name, fmt)
+    action.short_description = 'Export selected (%s)' % fmt.upper()
+    return action
+
+
 class PostAdmin(admin.ModelAdmin):
     form = PostForm
     list_display = ('title', 'type_of_post', 'created_by', 'created_date', 'updated_date', 'active', 'is_comment')
@@ -101,6 +205,7 @@ class PostAdmin(admin.ModelAdmin):
         }),
     )
     filter_horizontal = ('membership',)
+    actions = [export_action('posts', 'csv'), export_action('posts', 'jsonl')]
 
     def get_queryset(self, request):
         queryset = super().get_queryset(request)
@@ -112,12 +217,14 @@ class LikeAdmin(admin.ModelAdmin):
     list_display = ('user', 'post', 'type_of_like', 'active')
     search_fields = ('user__username', 'post__title')
     list_filter = ('active', 'type_of_like')
+    actions = [export_action('likes', 'csv'), export_action('likes', 'jsonl')]
 
 
 class CommentAdmin(admin.ModelAdmin):
     list_display = ('user', 'post', 'comment', 'created_date')
     search_fields = ('user__username', 'post__title', 'comment')
     list_filter = ('created_date',)
+    actions = [export_action('comments', 'csv'), export_action('comments', 'jsonl')]
 
 
 class MembershipAdmin(admin.ModelAdmin):
@@ -130,6 +237,9 @@ class SurveyAdmin(admin.ModelAdmin):
     list_display = ('title', 'created_by', 'created_date', 'updated_date', 'active')
     search_fields = ('title', 'created_by__username')
     list_filter = ('active', 'created_date')
+    actions = [export_action('survey_results', fmt,
+                             lambda queryset: Answer.objects.filter(questions__survey__in=queryset))
+               for fmt in ('csv', 'jsonl')]
 
 
 class QuestionAdmin(admin.ModelAdmin):
@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class MySocialMediaConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'my_social_media'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+        from . import profiling
+        profiling.install()
@@ -0,0 +1,143 @@
+import functools
+from asgiref.sync import sync_to_async
+from django.http import Http404, HttpResponse
+from django.views.decorators.http import require_GET
+from rest_framework import exceptions
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+from .models import Post, Comment, Like, User
+from .serializers import PostDetailsSerializer, UserProfileSerializer
+from .paginators import PostPaginator, CommentPaginator, LikePaginator, ReplyPaginator
+from . import fastpath, loaders, renderers, search, threads, timeline
+
+
+# view async cho các endpoint đọc nhiều nhất (chạy dưới ASGI: uvicorn my_social_media_site.asgi:application).
+# dùng async ORM của Django, còn authentication/paginator/plan dựng dict (fastpath.py) dùng lại của bản DRF sync
+# để response giống hệt /posts/, /users/...
+
+
+# bọc request Django thành request DRF để có query_params và xác thực OAuth2 như API sync
+def drf_request(request):
+    return Request(request, authenticators=[auth() for auth in api_settings.DEFAULT_AUTHENTICATION_CLASSES])
+
+
+def error_response(request, exc):
+    headers = {}
+    if isinstance(exc, (exceptions.NotAuthenticated, exceptions.AuthenticationFailed)):
+        authenticator = request._authenticator or (request.authenticators[0] if request.authenticators else None)
+        header = authenticator.authenticate_header(request) if authenticator else None
+        if header:
+            headers['WWW-Authenticate'] = header
+        else:
+            exc.status_code = 403
+    response = json_response({'detail': exc.detail}, status=exc.status_code)
+    for name, value in headers.items():
+        response[name] = value
+    return response
+
+
+# chỉ nhận GET; xác thực token (đọc DB) trong thread, lỗi API trả về JSON giống DRF
+def async_api_view(login_required=False):
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(request, *args, **kwargs):
+            request = drf_request(request)
+            try:
+                user = await sync_to_async(lambda: request.user)()
+                if login_required and not user.is_authenticated:
+                    raise exceptions.NotAuthenticated()
+                return await func(request, *args, **kwargs)
+            except Http404:
+                return error_response(request, exceptions.NotFound())
+            except exceptions.APIException as exc:
+                return error_response(request, exc)
+        return require_GET(wrapper)
+    return decorator
+
+
+def json_response(data, status=200):
+    return HttpResponse(renderers.dumps(data), status=status, content_type='application/json')
+
+
+# đọc trang bằng values() qua async ORM, phần dựng dict (fastpath.py) đọc thêm reactions/user nên chạy trong thread
+async def paginated_response(request, paginator_class, queryset, plan, ordering=None):
+    paginator = paginator_class()
+    if ordering:
+        paginator.ordering = ordering
+    page_queryset = paginator.get_page_queryset(fastpath.rows(queryset, plan), request)
+    page = paginator.finish_page([row async for row in page_queryset])
+    data = await sync_to_async(plan.build)(page, loaders.get_loader({'request': request}))
+    return json_response({'next': paginator.get_next_link(), 'results': data})
+
+
+async def get_active_post_id(pk):
+    post_id = await Post.objects.filter(active=True, pk=pk).values_list('pk', flat=True).afirst()
+    if post_id is None:
+        raise Http404
+    return post_id
+
+
+@async_api_view()
+async def post_list(request):
+    posts = PostDetailsSerializer.annotate_queryset(Post.objects.filter(active=True), request)
+    q = request.query_params.get('q')
+    if q:
+        return await paginated_response(request, PostPaginator, search.search_posts(posts, q),
+                                         fastpath.POSTS, ordering=search.RANKED_ORDERING)
+    return await paginated_response(request, PostPaginator, posts, fastpath.POSTS)
+
+
+@async_api_view()
+async def post_detail(request, pk):
+    posts = PostDetailsSerializer.annotate_queryset(Post.objects.filter(active=True, pk=pk), request)
+    row = await fastpath.rows(posts, fastpath.POSTS).afirst()
+    if row is None:
+        raise Http404
+    data = await sync_to_async(fastpath.POSTS.build)([row], loaders.get_loader({'request': request}))
+    return json_response(data[0])
+
+
+@async_api_view()
+async def post_comments(request, pk):
+    post_id = await get_active_post_id(pk)
+    comments = Comment.objects.filter(post_id=post_id, depth=0, active=True)
+    paginator = CommentPaginator()
+    page_queryset = paginator.get_page_queryset(fastpath.rows(comments, fastpath.COMMENTS), request)
+    page = paginator.finish_page([row async for row in page_queryset])
+    loader = loaders.get_loader({'request': request})
+    data = await sync_to_async(threads.build_threads)(page, post_id, request, loader, ReplyPaginator)
+    return json_response({'next': paginator.get_next_link(), 'results': data})
+
+
+@async_api_view()
+async def comment_replies(request, pk):
+    comment = await Comment.objects.filter(active=True, pk=pk).values('id', 'post_id', 'path', 'depth').afirst()
+    if comment is None:
+        raise Http404
+    try:
+        depth = int(request.query_params['depth'])
+    except (KeyError, ValueError):
+        depth = None
+    return await paginated_response(request, ReplyPaginator, threads.subtree(comment, depth), fastpath.COMMENTS)
+
+
+@async_api_view()
+async def post_likes(request, pk):
+    post_id = await get_active_post_id(pk)
+    return await paginated_response(request, LikePaginator, Like.objects.filter(post_id=post_id), fastpath.LIKES)
+
+
+@async_api_view()
+async def user_profile(request, pk):
+    user = await User.objects.filter(pk=pk).afirst()
+    if user is None:
+        raise Http404
+    return json_response(UserProfileSerializer(user).data)
+
+
+@async_api_view(login_required=True)
+async def feed(request):
+    # feed_queryset đọc danh sách nhóm của user ngay khi dựng queryset
+    posts = await sync_to_async(timeline.feed_queryset)(request.user)
+    posts = PostDetailsSerializer.annotate_queryset(posts, request)
+    return await paginated_response(request, PostPaginator, posts, fastpath.POSTS)
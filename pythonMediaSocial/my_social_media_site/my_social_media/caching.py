@@ -0,0 +1,130 @@
+import functools
+import hashlib
+import time
+import uuid
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from rest_framework.response import Response
+
+LOCK_TIMEOUT = 10
+LOCK_WAIT = 2.0
+LOCK_POLL_INTERVAL = 0.05
+METRICS_KEY = 'cache_metrics:%s:%s'
+LOCAL_VERSION_TIMEOUT = 30
+
+
+def get_cache():
+    return caches[getattr(settings, 'RESPONSE_CACHE_ALIAS', 'default')]
+
+
+def policy_timeout(policy, default):
+    return getattr(settings, 'RESPONSE_CACHE_POLICIES', {}).get(policy, default)
+
+
+# namespace là nhãn model ('my_social_media.post') hoặc 1 object ('my_social_media.post:3');
+# đổi version của namespace là mọi key phụ thuộc vào nó hết hiệu lực
+def model_namespace(model, pk=None):
+    if pk is None:
+        return model._meta.label_lower
+    return '%s:%s' % (model._meta.label_lower, pk)
+
+
+# LocMemCache là cache riêng của từng process: bump_namespace ở 1 worker không tới các worker khác, nên version
+# tự hết hạn sau vài giây để worker khác không giữ payload/ETag cũ mãi. Cache dùng chung (Redis, Memcached,
+# FileBasedCache) thì version không hết hạn. Ghi đè bằng RESPONSE_CACHE_VERSION_TIMEOUT
+def version_timeout():
+    default = LOCAL_VERSION_TIMEOUT if isinstance(get_cache(), LocMemCache) else None
+    return getattr(settings, 'RESPONSE_CACHE_VERSION_TIMEOUT', default)
+
+
+def namespace_version(namespace):
+    cache = get_cache()
+    key = 'cache_version:%s' % namespace
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, uuid.uuid4().hex, version_timeout())
+        version = cache.get(key)
+    return version
+
+
+def bump_namespace(namespace):
+    get_cache().set('cache_version:%s' % namespace, uuid.uuid4().hex, version_timeout())
+
+
+def record(policy, outcome):
+    cache = get_cache()
+    key = METRICS_KEY % (policy, outcome)
+    if not cache.add(key, 1, None):
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.add(key, 1, None)
+
+
+def cache_stats(policies):
+    cache = get_cache()
+    stats = {}
+    for policy in policies:
+        hits = cache.get(METRICS_KEY % (policy, 'hit'), 0)
+        misses = cache.get(METRICS_KEY % (policy, 'miss'), 0)
+        total = hits + misses
+        stats[policy] = {'hits': hits, 'misses': misses, 'hit_ratio': round(hits / total, 4) if total else None}
+    return stats
+
+
+# chỉ 1 request tính lại giá trị khi hết hạn, các request khác chờ tối đa LOCK_WAIT giây
+def get_or_compute(policy, key, compute, timeout, cacheable=lambda value: True):
+    cache = get_cache()
+    value = cache.get(key)
+    if value is not None:
+        record(policy, 'hit')
+        return value
+
+    lock_key = '%s:lock' % key
+    if not cache.add(lock_key, 1, LOCK_TIMEOUT):
+        deadline = time.monotonic() + LOCK_WAIT
+        while time.monotonic() < deadline:
+            time.sleep(LOCK_POLL_INTERVAL)
+            value = cache.get(key)
+            if value is not None:
+                record(policy, 'hit')
+                return value
+        lock_key = None
+
+    record(policy, 'miss')
+    try:
+        value = compute()
+        if cacheable(value):
+            cache.set(key, value, timeout)
+    finally:
+        if lock_key:
+            cache.delete(lock_key)
+    return value
+
+
+# cache response.data của action GET; namespaces là list hoặc hàm (view, kwargs) -> list.
+# per_viewer=True khi payload phụ thuộc user đang xem, còn lại mọi user dùng chung 1 entry
+def cache_response(policy, timeout, namespaces=(), anonymous_only=False, per_viewer=False):
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(view, request, *args, **kwargs):
+            if request.method != 'GET' or (anonymous_only and request.user.is_authenticated):
+                return func(view, request, *args, **kwargs)
+
+            names = namespaces(view, kwargs) if callable(namespaces) else namespaces
+            versions = ':'.join(namespace_version(name) for name in names)
+            viewer = request.user.pk if per_viewer and request.user.is_authenticated else 0
+            digest = hashlib.md5(('%s|%s|%s' % (versions, viewer, request.get_full_path())).encode('utf-8'),
+                                 usedforsecurity=False)
+            key = 'response:%s:%s' % (policy, digest.hexdigest())
+
+            def compute():
+                response = func(view, request, *args, **kwargs)
+                return {'status': response.status_code, 'data': response.data}
+
+            result = get_or_compute(policy, key, compute, policy_timeout(policy, timeout),
+                                    cacheable=lambda value: value['status'] == 200)
+            return Response(result['data'], status=result['status'])
+        return wrapper
+    return decorator
@@ -0,0 +1,80 @@
+from django.db import transaction
+from django.db.models import F
+from .models import Post, PostReaction
+
+
+# cập nhật bộ đếm trên Post bằng F() để không mất số khi có request đồng thời
+def _add_reaction(post_id, type_of_like_id, delta):
+    updated = PostReaction.objects.filter(post_id=post_id, type_of_like_id=type_of_like_id) \
+        .update(count=F('count') + delta)
+    if not updated:
+        PostReaction.objects.get_or_create(post_id=post_id, type_of_like_id=type_of_like_id)
+        PostReaction.objects.filter(post_id=post_id, type_of_like_id=type_of_like_id) \
+            .update(count=F('count') + delta)
+
+
+def like_added(post_id, type_of_like_id):
+    with transaction.atomic():
+        Post.objects.filter(pk=post_id).update(like_count=F('like_count') + 1)
+        _add_reaction(post_id, type_of_like_id, 1)
+
+
+def like_removed(post_id, type_of_like_id):
+    with transaction.atomic():
+        Post.objects.filter(pk=post_id).update(like_count=F('like_count') - 1)
+        _add_reaction(post_id, type_of_like_id, -1)
+
+
+def like_type_changed(post_id, old_type_id, new_type_id):
+    if old_type_id == new_type_id:
+        return
+    with transaction.atomic():
+        _add_reaction(post_id, old_type_id, -1)
+        _add_reaction(post_id, new_type_id, 1)
+
+
+# dùng khi 1 like đổi trạng thái (active, type) -> (active, type) bất kỳ
+def like_changed(post_id, was_active, old_type_id, is_active, new_type_id):
+    if was_active and is_active:
+        like_type_changed(post_id, old_type_id, new_type_id)
+    elif was_active:
+        like_removed(post_id, old_type_id)
+    elif is_active:
+        like_added(post_id, new_type_id)
+
+
+def comments_added(post_id, count=1):
+    Post.objects.filter(pk=post_id).update(comment_count=F('comment_count') + count)
+
+
+def comments_removed(post_id, count=1):
+    Post.objects.filter(pk=post_id).update(comment_count=F('comment_count') - count)
+
+
+# thay đổi bộ đếm khi 1 like đổi trạng thái, trả về (delta like_count, {type_of_like_id: delta})
+def like_deltas(was_active, old_type_id, is_active, new_type_id):
+    reactions = {}
+    if was_active:
+        reactions[old_type_id] = reactions.get(old_type_id, 0) - 1
+    if is_active:
+        reactions[new_type_id] = reactions.get(new_type_id, 0) + 1
+    return int(is_active) - int(was_active), {k: v for k, v in reactions.items() if v}
+
+
+# áp dụng 1 lần các thay đổi đã gộp theo post: like_deltas {post_id: n}, reaction_deltas
+# {(post_id, type_of_like_id): n}, comment_deltas {post_id: n}
+def apply_deltas(like_deltas=None, reaction_deltas=None, comment_deltas=None):
+    like_deltas = like_deltas or {}
+    comment_deltas = comment_deltas or {}
+    with transaction.atomic():
+        for post_id in set(like_deltas) | set(comment_deltas):
+            changes = {}
+            if like_deltas.get(post_id):
+                changes['like_count'] = F('like_count') + like_deltas[post_id]
+            if comment_deltas.get(post_id):
+                changes['comment_count'] = F('comment_count') + comment_deltas[post_id]
+            if changes:
+                Post.objects.filter(pk=post_id).update(**changes)
+        for (post_id, type_of_like_id), delta in (reaction_deltas or {}).items():
+            if delta:
+                _add_reaction(post_id, type_of_like_id, delta)
@@ -1,35 +1,83 @@
-from django.db.models import Count
-from django.db.models.functions import ExtractYear, ExtractMonth
-from django.db.models import Func
-from .models import Post, User
-from datetime import datetime
-from django.db.models import Count
+from datetime import date, datetime, time
+from django.db.models import Count, F, Sum
+from django.db.models.functions import (ExtractYear, ExtractMonth, ExtractQuarter, TruncDay, TruncWeek,
+                                        TruncMonth, TruncQuarter)
+from django.utils import timezone
+from .models import DailyStat, Post, User
+
+GRANULARITIES = {
+    'day': TruncDay,
+    'week': TruncWeek,
+    'month': TruncMonth,
+    'quarter': TruncQuarter,
+}
+POST_BREAKDOWNS = {
+    'post_type': 'type_of_post__name_type',
+    'membership': 'membership__group_name',
+}
+USER_BREAKDOWNS = {
+    'membership': 'membership__group_name',
+}
+
+
+# các hàm thống kê đọc bảng DailyStat (mỗi ngày 1 dòng) thay vì GROUP BY trên bảng Post/User
+def _daily(metric):
+    return DailyStat.objects.filter(metric=metric)
 
 
 def get_users_by_year():
-    # Sử dụng annotate để tính tổng số lượng người dùng theo từng năm
-    users_stats = User.objects.annotate(year=ExtractYear('date_joined')).values('year').annotate(count=Count('id')).order_by('year')
-    return users_stats
+    # tổng số lượng người dùng theo từng năm
+    return _daily(DailyStat.USERS).values(year=ExtractYear('day')).annotate(count=Sum('count')).order_by('year')
 
 
 def get_posts_by_year():
-    return Post.objects.values(year=ExtractYear('created_date')).annotate(count=Count('id')).order_by('year')
+    return _daily(DailyStat.POSTS).values(year=ExtractYear('day')).annotate(count=Sum('count')).order_by('year')
 
 
-def get_posts_by_month():
-    return Post.objects.annotate(
-        year=ExtractYear('created_date'),
-        month=ExtractMonth('created_date')
-    ).values('year', 'month').annotate(
-        count=Count('id')
-    ).order_by('year', 'month')
+# lọc theo khoảng [start, end) trên cột ngày để dùng được index, không dùng ExtractYear trong WHERE
+def year_range(year):
+    return date(year, 1, 1), date(year + 1, 1, 1)
 
 
-class ExtractQuarter(Func):
-    function = 'EXTRACT'
-    template = '%(function)s(quarter FROM %(expressions)s)'
+def get_posts_by_month(year=None):
+    stats = _daily(DailyStat.POSTS)
+    if year is not None:
+        start, end = year_range(int(year))
+        stats = stats.filter(day__gte=start, day__lt=end)
+    return stats.values(
+        year=ExtractYear('day'),
+        month=ExtractMonth('day')
+    ).annotate(
+        count=Sum('count')
+    ).order_by('year', 'month')
 
 
 def get_posts_by_quarter():
-    return Post.objects.annotate(year=ExtractYear('created_date'), quarter=ExtractQuarter('created_date')).values(
-        'year', 'quarter').annotate(count=Count('id')).order_by('year', 'quarter')
+    return _daily(DailyStat.POSTS).values(
+        year=ExtractYear('day'), quarter=ExtractQuarter('day')
+    ).annotate(count=Sum('count')).order_by('year', 'quarter')
+
+
+def _grouped(queryset, field, start, end, granularity, breakdowns, breakdown):
+    if granularity not in GRANULARITIES:
+        raise ValueError('granularity must be one of %s' % ', '.join(GRANULARITIES))
+    if breakdown is not None and breakdown not in breakdowns:
+        raise ValueError('breakdown must be one of %s' % ', '.join(breakdowns))
+
+    queryset = queryset.filter(**{'%s__gte' % field: start, '%s__lt' % field: end})
+    columns = {'period': GRANULARITIES[granularity](field)}
+    if breakdown is not None:
+        columns['group'] = F(breakdowns[breakdown])
+    return queryset.order_by().values(**columns).annotate(count=Count('id')).order_by(*columns)
+
+
+# số post trong [start, end) theo day/week/month/quarter, có thể tách theo post_type hoặc membership
+def get_post_stats(start, end, granularity='month', breakdown=None):
+    return _grouped(Post.objects.all(), 'created_date', start, end, granularity, POST_BREAKDOWNS, breakdown)
+
+
+def get_user_stats(start, end, granularity='month', breakdown=None):
+    # date_joined là DateTimeField nên đổi ngày sang datetime đầu ngày
+    start = timezone.make_aware(datetime.combine(start, time.min))
+    end = timezone.make_aware(datetime.combine(end, time.min))
+    return _grouped(User.objects.all(), 'date_joined', start, end, granularity, USER_BREAKDOWNS, breakdown)
@@ -0,0 +1,72 @@
+import csv
+import json
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+from .models import Post, Like, Comment, Answer
+
+DEFAULT_CHUNK_SIZE = 2000
+
+# tên export -> (queryset, các cột)
+EXPORTS = {
+    'posts': (lambda: Post.objects.all(),
+              ['id', 'title', 'type_of_post_id', 'created_by_id', 'created_date', 'updated_date', 'active',
+               'is_comment', 'like_count', 'comment_count']),
+    'likes': (lambda: Like.objects.all(),
+              ['id', 'user_id', 'post_id', 'type_of_like_id', 'active', 'created_date', 'updated_date']),
+    'comments': (lambda: Comment.objects.all(),
+                 ['id', 'user_id', 'post_id', 'comment', 'active', 'created_date', 'updated_date']),
+    'survey_results': (lambda: Answer.objects.all(),
+                       ['id', 'questions__survey_id', 'questions__survey__title', 'questions_id',
+                        'questions__content', 'content', 'quantity']),
+}
+FORMATS = {
+    'csv': 'text/csv',
+    'jsonl': 'application/x-ndjson',
+}
+
+
+# đọc từng đoạn theo khoá chính (pk > id cuối đoạn trước) nên bộ nhớ không phụ thuộc số dòng,
+# kể cả với MySQL là nơi iterator() vẫn nhận hết kết quả về client
+def iter_chunks(queryset, fields, chunk_size=DEFAULT_CHUNK_SIZE):
+    last_pk = None
+    queryset = queryset.order_by('pk')
+    while True:
+        chunk = queryset if last_pk is None else queryset.filter(pk__gt=last_pk)
+        rows = list(chunk.values_list('pk', *fields)[:chunk_size])
+        if not rows:
+            return
+        last_pk = rows[-1][0]
+        yield [row[1:] for row in rows]
+
+
+class _Echo:
+    def write(self, value):
+        return value
+
+
+def iter_csv(queryset, fields, chunk_size=DEFAULT_CHUNK_SIZE):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(fields)
+    for rows in iter_chunks(queryset, fields, chunk_size):
+        yield ''.join(writer.writerow(row) for row in rows)
+
+
+def iter_jsonl(queryset, fields, chunk_size=DEFAULT_CHUNK_SIZE):
+    for rows in iter_chunks(queryset, fields, chunk_size):
+        yield ''.join(json.dumps(dict(zip(fields, row)), cls=DjangoJSONEncoder, ensure_ascii=False) + '\n'
+                      for row in rows)
+
+
+def iter_export(name, fmt, queryset=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    get_queryset, fields = EXPORTS[name]
+    if queryset is None:
+        queryset = get_queryset()
+    if fmt == 'csv':
+        return iter_csv(queryset, fields, chunk_size)
+    return iter_jsonl(queryset, fields, chunk_size)
+
+
+def streaming_response(name, fmt, queryset=None):
+    response = StreamingHttpResponse(iter_export(name, fmt, queryset), content_type=FORMATS[fmt])
+    response['Content-Disposition'] = 'attachment; filename="%s.%s"' % (name, fmt)
+    return response
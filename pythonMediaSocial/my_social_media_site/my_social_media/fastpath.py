@@ -0,0 +1,97 @@
+from collections import defaultdict, namedtuple
+from .models import PostReaction
+from .registry import like_types
+from . import media, profiling
+
+# đường đọc nhanh cho các list endpoint: đọc .values() rồi dựng dict trực tiếp theo plan cố định,
+# không qua ModelSerializer (không introspect field, không tạo Field/instance model cho từng dòng).
+# output phải giống hệt PostDetailsSerializer, CommentSerializer, LikeSerializer, UserSummarySerializer
+Plan = namedtuple('Plan', ['columns', 'build'])
+
+
+def _date(value):
+    return value.isoformat() if value is not None else None
+
+
+def rows(queryset, plan):
+    # giữ các annotation (viewer_like_type, search_rank) cho plan và paginator; values() không prefetch được
+    return queryset.prefetch_related(None).values(*plan.columns, *queryset.query.annotations)
+
+
+def user_summary(row):
+    avatar = row['avatar']
+    return {
+        'id': row['id'],
+        'first_name': row['first_name'],
+        'last_name': row['last_name'],
+        'avatar_url': media.image_url(avatar),
+        'avatar_thumb_url': media.image_url(avatar, 'thumb'),
+    }
+
+
+@profiling.serializing()
+def build_posts(rows, loader):
+    reactions = defaultdict(list)
+    if rows:
+        for post_id, type_id, count in PostReaction.objects.filter(post_id__in=[row['id'] for row in rows],
+                                                                   count__gt=0) \
+                .order_by('id').values_list('post_id', 'type_of_like_id', 'count'):
+            reactions[post_id].append({'type_of_like': type_id, 'count': count})
+    loader.prime({row['created_by_id'] for row in rows})
+    get_user = loader.get
+
+    result = []
+    for row in rows:
+        liked_type = row.get('viewer_like_type')
+        result.append({
+            'id': row['id'],
+            'title': row['title'],
+            'content': row['content'],
+            'type_of_post': row['type_of_post_id'],
+            'liked': liked_type is not None,
+            'liked_type': liked_type,
+            'created_by': get_user(row['created_by_id']),
+            'like_count': row['like_count'],
+            'comment_count': row['comment_count'],
+            'reactions': reactions.get(row['id'], []),
+        })
+    return result
+
+
+@profiling.serializing()
+def build_comments(rows, loader):
+    loader.prime({row['user_id'] for row in rows})
+    get_user = loader.get
+    return [{
+        'id': row['id'],
+        'comment': row['comment'],
+        'user': get_user(row['user_id']),
+        'parent': row['parent_id'],
+        'depth': row['depth'],
+        'reply_count': row['reply_count'],
+        'active': row['active'],
+        'created_date': _date(row['created_date']),
+        'updated_date': _date(row['updated_date']),
+    } for row in rows]
+
+
+# user là id như LikeSerializer
+@profiling.serializing()
+def build_likes(rows, loader):
+    types = {pk: {'id': like_type.pk, 'name_type': like_type.name_type} for pk, like_type in like_types.all().items()}
+    return [{
+        'user': row['user_id'],
+        'type_of_like': types.get(row['type_of_like_id']),
+        'post': row['post_id'],
+        'active': row['active'],
+    } for row in rows]
+
+
+# created_date, id luôn có trong columns vì paginator keyset đọc chúng từ dòng cuối trang
+POSTS = Plan(('id', 'title', 'content', 'type_of_post_id', 'created_by_id', 'like_count', 'comment_count',
+              'created_date'), build_posts)
+# path để paginator replies (sắp theo path) đọc cursor, không trả ra ngoài
+COMMENTS = Plan(('id', 'comment', 'user_id', 'parent_id', 'depth', 'reply_count', 'active', 'path',
+                 'created_date', 'updated_date'), build_comments)
+LIKES = Plan(('id', 'user_id', 'type_of_like_id', 'post_id', 'active', 'created_date'), build_likes)
+USER_SUMMARY_COLUMNS = ('id', 'first_name', 'last_name', 'avatar')
@@ -4,3 +4,23 @@ from django import forms
 class YearForm(forms.Form):
     year_choices = [(year, year) for year in range(2000, 2030)]
     year = forms.ChoiceField(choices=year_choices)
+
+
+class StatsRangeForm(forms.Form):
+    start = forms.DateField(widget=forms.DateInput(attrs={'type': 'date'}))
+    end = forms.DateField(widget=forms.DateInput(attrs={'type': 'date'}))
+    granularity = forms.ChoiceField(choices=[('day', 'Ngày'), ('week', 'Tuần'), ('month', 'Tháng'),
+                                             ('quarter', 'Quý')], initial='month')
+    breakdown = forms.ChoiceField(choices=[('', 'Không'), ('post_type', 'Loại bài đăng'),
+                                           ('membership', 'Nhóm')], required=False)
+
+    def clean(self):
+        cleaned_data = super().clean()
+        if cleaned_data.get('start') and cleaned_data.get('end') and cleaned_data['start'] >= cleaned_data['end']:
+            raise forms.ValidationError('Ngày bắt đầu phải trước ngày kết thúc')
+        return cleaned_data
+
+
+# user không có loại bài đăng nên chỉ tách theo nhóm
+class UserStatsRangeForm(StatsRangeForm):
+    breakdown = forms.ChoiceField(choices=[('', 'Không'), ('membership', 'Nhóm')], required=False)
@@ -0,0 +1,178 @@
+import contextlib
+import csv
+import itertools
+import json
+from collections import namedtuple
+from datetime import date
+from django.contrib.auth.hashers import identify_hasher, make_password
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db import transaction
+from django.db.models import DateTimeField
+from django.utils import timezone
+from .models import Comment, Like, Membership, Post, User
+from . import threads
+
+DEFAULT_CHUNK_SIZE = 5000
+# bulk_create không gửi signal nên bộ đếm, PostReaction, timeline, search index và DailyStat dựng lại sau khi nhập
+REBUILD_COMMANDS = ['reconcile_counters', 'rebuild_timelines', 'rebuild_search_index', 'rebuild_daily_stats']
+# cột chứa danh sách nhóm (CSV: "1|2|3", JSONL: [1, 2, 3]), ghi vào bảng M2M sau khi ghi đoạn dòng chính
+MEMBERSHIP_IDS = 'membership_ids'
+
+
+class DataImportError(Exception):
+    pass
+
+
+# model -> chuẩn bị 1 đoạn object trước khi ghi (kiểm tra/điền thêm cột), có bảng M2M membership hay không
+Import = namedtuple('Import', ['model', 'prepare', 'm2m'])
+
+
+# giống receiver update_is_active (pre_save không chạy với bulk_create); password phải là hash của Django,
+# trống thì user không đăng nhập bằng password được
+def prepare_users(users):
+    for user in users:
+        if not user.password:
+            user.password = make_password(None)
+        else:
+            try:
+                identify_hasher(user.password)
+            except ValueError:
+                raise DataImportError('user %s: password must be a Django password hash' % user.username)
+        if user.is_staff and not user.is_active:
+            user.is_active = True
+
+
+def prepare_comments(comments):
+    if any(comment.pk is None for comment in comments):
+        raise DataImportError('comments need an id column to build thread paths')
+    try:
+        threads.assign_imported_paths(comments)
+    except ValueError as e:
+        raise DataImportError(str(e))
+
+
+# thứ tự nhập khi nhiều file trong 1 lần chạy
+IMPORTS = {
+    'memberships': Import(Membership, None, False),
+    'users': Import(User, prepare_users, True),
+    'user_memberships': Import(User.membership.through, None, False),
+    'posts': Import(Post, None, True),
+    'post_memberships': Import(Post.membership.through, None, False),
+    'comments': Import(Comment, prepare_comments, False),
+    'likes': Import(Like, None, False),
+}
+FORMATS = ['csv', 'jsonl']
+
+
+def iter_rows(path, fmt):
+    with open(path, encoding='utf-8', newline='') as f:
+        if fmt == 'csv':
+            yield from csv.DictReader(f)
+        else:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def _membership_ids(value):
+    if value in (None, ''):
+        return []
+    if isinstance(value, str):
+        return [int(pk) for pk in value.split('|') if pk]
+    return [int(pk) for pk in value]
+
+
+# cột -> field của model (nhận cả tên field lẫn attname như created_by_id)
+def resolve_fields(spec, columns):
+    fields = {}
+    for column in columns:
+        if column == MEMBERSHIP_IDS and spec.m2m:
+            continue
+        try:
+            field = spec.model._meta.get_field(column)
+        except FieldDoesNotExist:
+            raise DataImportError('unknown column %s for %s' % (column, spec.model._meta.model_name))
+        if not field.concrete or field.many_to_many:
+            raise DataImportError('column %s for %s is not a concrete field' % (column, spec.model._meta.model_name))
+        fields[column] = field
+    return fields
+
+
+# ô trống (CSV '' hoặc JSON null/thiếu key): chuỗi rỗng với field text không null, NULL nếu field cho phép,
+# còn lại lấy default của field
+def build_object(spec, fields, row):
+    values = {}
+    for column, field in fields.items():
+        value = row.get(column)
+        if value is None or value == '':
+            if value == '' and field.empty_strings_allowed and not field.null:
+                values[field.attname] = ''
+            else:
+                values[field.attname] = None if field.null else field.get_default()
+        else:
+            values[field.attname] = field.to_python(value)
+    return spec.model(**values)
+
+
+# auto_now/auto_now_add ghi đè ngày khi bulk_create, tắt tạm để giữ ngày trong file (ô trống thì lấy hôm nay)
+@contextlib.contextmanager
+def keep_dates(fields):
+    auto = [(field, field.auto_now, field.auto_now_add) for field in fields.values()
+            if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False)]
+    for field, _, _ in auto:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield [field for field, _, _ in auto]
+    finally:
+        for field, auto_now, auto_now_add in auto:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+def write_chunk(spec, objects, memberships, dated_fields, ignore_conflicts):
+    for obj in objects:
+        for field in dated_fields:
+            if getattr(obj, field.attname) is None:
+                setattr(obj, field.attname, timezone.now() if isinstance(field, DateTimeField) else date.today())
+    if spec.prepare:
+        spec.prepare(objects)
+
+    with transaction.atomic():
+        spec.model.objects.bulk_create(objects, ignore_conflicts=ignore_conflicts)
+        if memberships:
+            through = spec.model.membership.through
+            owner = '%s_id' % spec.model._meta.model_name
+            through.objects.bulk_create([through(**{owner: pk, 'membership_id': membership_id})
+                                         for pk, membership_id in memberships], ignore_conflicts=ignore_conflicts)
+
+
+# nhập 1 file theo từng đoạn chunk_size dòng, mỗi đoạn 1 transaction (chạy lại với ignore_conflicts=True
+# để bỏ qua các id đã nhập); trả về số dòng sau mỗi đoạn
+def import_rows(name, rows, chunk_size=DEFAULT_CHUNK_SIZE, ignore_conflicts=False):
+    spec = IMPORTS[name]
+    rows = iter(rows)
+    first = next(rows, None)
+    if first is None:
+        return
+    fields = resolve_fields(spec, first.keys())
+    rows = itertools.chain([first], rows)
+    line = 0
+
+    with keep_dates(fields) as dated_fields:
+        while True:
+            chunk = list(itertools.islice(rows, chunk_size))
+            if not chunk:
+                return
+            objects, memberships = [], []
+            for row in chunk:
+                line += 1
+                try:
+                    obj = build_object(spec, fields, row)
+                    membership_ids = _membership_ids(row.get(MEMBERSHIP_IDS)) if spec.m2m else []
+                except (ValidationError, ValueError, TypeError) as e:
+                    raise DataImportError('%s row %d: %s' % (name, line, e))
+                if membership_ids and obj.pk is None:
+                    raise DataImportError('%s row %d: membership_ids needs an id column' % (name, line))
+                objects.append(obj)
+                memberships += [(obj.pk, membership_id) for membership_id in membership_ids]
+            write_chunk(spec, objects, memberships, dated_fields, ignore_conflicts)
+            yield line
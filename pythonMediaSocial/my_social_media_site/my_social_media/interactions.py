@@ -0,0 +1,162 @@
+import uuid
+from collections import defaultdict
+from datetime import date
+from django.db import IntegrityError, transaction
+from .models import Post, Like, Comment, PostReaction
+from . import counters, search, threads
+
+LIKE = 'like'
+UNLIKE = 'unlike'
+COMMENT = 'comment'
+
+
+def _locked_like(user, post_id):
+    return Like.objects.select_for_update().filter(user=user, post_id=post_id) \
+        .values_list('active', 'type_of_like_id').first()
+
+
+# 1 đường ghi chung cho like/unlike/update_like: khoá dòng cũ (nếu có) để biết trạng thái trước rồi UPDATE,
+# chưa có thì INSERT. 2 request cùng like lần đầu thì request chèn sau gặp IntegrityError (unique user, post):
+# khi đó khoá dòng request kia vừa ghi và cập nhật như đã có, bộ đếm chỉ cộng 1 lần.
+# toggle=True đảo active như action like; require_existing=True thì trả None nếu user chưa từng like
+@transaction.atomic
+def set_like(user, post_id, type_of_like=None, active=True, toggle=False, require_existing=False):
+    previous = _locked_like(user, post_id)
+    if previous is None:
+        if require_existing:
+            return None
+        like = Like(user=user, post_id=post_id, active=True if toggle else active, type_of_like=type_of_like)
+        try:
+            with transaction.atomic():
+                like.save(force_insert=True)
+        except IntegrityError:
+            previous = _locked_like(user, post_id)
+        else:
+            if like.active:
+                counters.like_added(post_id, like.type_of_like_id)
+            return like
+
+    was_active, old_type_id = previous
+    if toggle:
+        active = not was_active
+    like = Like(user=user, post_id=post_id, active=active,
+                type_of_like_id=type_of_like.pk if type_of_like is not None else old_type_id)
+    Like.objects.filter(user=user, post_id=post_id).update(active=like.active, type_of_like_id=like.type_of_like_id,
+                                                           updated_date=date.today())
+
+    delta, reactions = counters.like_deltas(was_active, old_type_id, like.active, like.type_of_like_id)
+    counters.apply_deltas({post_id: delta}, {(post_id, type_id): n for type_id, n in reactions.items()})
+    return like
+
+
+# payload gọn trả về sau khi like: trạng thái mới + bộ đếm của post
+def like_state(like):
+    like_count = Post.objects.filter(pk=like.post_id).values_list('like_count', flat=True).first()
+    reactions = PostReaction.objects.filter(post_id=like.post_id, count__gt=0).values_list('type_of_like_id', 'count')
+    return {
+        'post': like.post_id,
+        'liked': like.active,
+        'type_of_like': like.type_of_like_id if like.active else None,
+        'like_count': like_count,
+        'reactions': [{'type_of_like': type_id, 'count': count} for type_id, count in reactions],
+    }
+
+
+def _error(index, detail):
+    return {'index': index, 'status': 'error', 'detail': detail}
+
+
+def _like_result(index, like):
+    return {'index': index, 'status': 'ok', 'post': like.post_id, 'liked': like.active,
+            'type_of_like': like.type_of_like_id if like.active else None}
+
+
+# MySQL không trả id sau bulk_create: mỗi comment được ghi với path tạm duy nhất (không bắt đầu bằng số nên không
+# trùng path thật, threads.py), đọc lại id theo path đó qua index (post, path) rồi assign_root_paths ghi path thật.
+# Không đoán theo "N comment mới nhất của user" vì user có thể gửi 2 batch cùng lúc
+def _tag_comments(comments):
+    batch = uuid.uuid4().hex
+    for index, comment in enumerate(comments):
+        comment.path = 'batch-%s-%d' % (batch, index)
+
+
+def _assign_comment_ids(comments):
+    if not comments or comments[0].pk is not None:
+        return
+    ids = dict(Comment.objects.filter(post_id__in={c.post_id for c in comments},
+                                      path__in=[c.path for c in comments]).values_list('path', 'id'))
+    for comment in comments:
+        comment.pk = ids[comment.path]
+
+
+# áp dụng cả lô thao tác của 1 user: operations là list dict đã validate (hoặc None nếu item lỗi).
+# like = bật like với type_of_like (idempotent), unlike = tắt like, comment = thêm comment.
+# Trả về kết quả theo thứ tự item. Like đã có của user được khoá tới cuối transaction để delta bộ đếm tính từ
+# trạng thái không bị request khác đổi giữa chừng
+@transaction.atomic
+def apply_batch(user, operations, errors):
+    results = [None] * len(operations)
+    post_ids = {op['post'] for op in operations if op}
+    posts = set(Post.objects.filter(pk__in=post_ids, active=True).values_list('pk', flat=True))
+    likes = {like.post_id: like for like in Like.objects.select_for_update().filter(user=user, post_id__in=posts)}
+    before = {post_id: (like.active, like.type_of_like_id) for post_id, like in likes.items()}
+    new_likes = {}
+    comments = []
+
+    for index, op in enumerate(operations):
+        if op is None:
+            results[index] = _error(index, errors[index])
+            continue
+        if op['post'] not in posts:
+            results[index] = _error(index, 'Post not found.')
+            continue
+
+        if op['op'] == COMMENT:
+            comment = Comment(user=user, post_id=op['post'], comment=op['comment'])
+            comments.append((index, comment))
+            continue
+
+        like = likes.get(op['post'])
+        if op['op'] == LIKE:
+            if like is None:
+                like = Like(user=user, post_id=op['post'], type_of_like=op['type_of_like'])
+                likes[op['post']] = new_likes[op['post']] = like
+            like.active = True
+            like.type_of_like = op['type_of_like']
+        elif like is None:
+            results[index] = _error(index, 'Like not found.')
+            continue
+        else:
+            like.active = False
+        results[index] = _like_result(index, like)
+
+    like_deltas = defaultdict(int)
+    reaction_deltas = defaultdict(int)
+    for post_id, like in likes.items():
+        was_active, old_type_id = before.get(post_id, (False, None))
+        delta, reactions = counters.like_deltas(was_active, old_type_id, like.active, like.type_of_like_id)
+        like_deltas[post_id] += delta
+        for type_of_like_id, n in reactions.items():
+            reaction_deltas[(post_id, type_of_like_id)] += n
+    comment_deltas = defaultdict(int)
+    for _, comment in comments:
+        comment_deltas[comment.post_id] += 1
+
+    changed = [like for post_id, like in likes.items()
+               if post_id in before and before[post_id] != (like.active, like.type_of_like_id)]
+    for like in changed:
+        like.updated_date = date.today()
+
+    new_comments = [comment for _, comment in comments]
+    _tag_comments(new_comments)
+    Like.objects.bulk_create(new_likes.values(), batch_size=500)
+    Like.objects.bulk_update(changed, ['active', 'type_of_like', 'updated_date'], batch_size=500)
+    Comment.objects.bulk_create(new_comments, batch_size=500)
+    _assign_comment_ids(new_comments)
+    threads.assign_root_paths([comment.pk for comment in new_comments])
+    counters.apply_deltas(like_deltas, reaction_deltas, comment_deltas)
+    search.index_comments(new_comments)
+
+    for index, comment in comments:
+        results[index] = {'index': index, 'status': 'ok', 'post': comment.post_id, 'comment': comment.pk}
+    return results
@@ -0,0 +1,74 @@
+import logging
+from .models import User
+from . import fastpath
+
+logger = logging.getLogger(__name__)
+
+LOADER_ATTR = '_user_summary_loader'
+
+
+# identity map cho thông tin rút gọn của user trong 1 request: các serializer (post, comment, like, survey)
+# chỉ đưa user id vào, loader gom các id chưa có thành 1 query User và serialize mỗi user đúng 1 lần
+class UserSummaryLoader:
+    def __init__(self):
+        self.summaries = {}
+        self.requested = 0
+        self.queries = 0
+
+    # summary dựng bằng fastpath.user_summary, cùng output với UserSummarySerializer
+    def prime(self, user_ids):
+        missing = {pk for pk in user_ids if pk is not None} - self.summaries.keys()
+        if not missing:
+            return
+        users = User.objects.filter(pk__in=missing).values(*fastpath.USER_SUMMARY_COLUMNS)
+        self.queries += 1
+        for row in users:
+            self.summaries[row['id']] = fastpath.user_summary(row)
+        # id không còn tồn tại thì nhớ là None để không query lại
+        for pk in missing - self.summaries.keys():
+            self.summaries[pk] = None
+
+    def get(self, user_id):
+        self.requested += 1
+        if user_id not in self.summaries:
+            self.prime([user_id])
+        return self.summaries[user_id]
+
+    def stats(self):
+        unique = len(self.summaries)
+        return {'requested': self.requested, 'unique': unique, 'collapsed': max(0, self.requested - unique),
+                'queries': self.queries}
+
+
+# loader gắn vào HttpRequest để mọi serializer trong request (và middleware) dùng chung,
+# không có request thì gắn vào context của serializer gốc
+def get_loader(context):
+    request = context.get('request')
+    holder = getattr(request, '_request', request)
+    if holder is None:
+        return context.setdefault(LOADER_ATTR, UserSummaryLoader())
+    loader = getattr(holder, LOADER_ATTR, None)
+    if loader is None:
+        loader = UserSummaryLoader()
+        setattr(holder, LOADER_ATTR, loader)
+    return loader
+
+
+def request_stats(request):
+    loader = getattr(request, LOADER_ATTR, None)
+    return loader.stats() if loader is not None else None
+
+
+def _value(item, source):
+    if isinstance(item, dict):
+        return item.get(source)
+    return getattr(item, source, None)
+
+
+# gom user id của cả trang trước khi serialize từng dòng
+def prime(serializer, items):
+    from .serializers import UserSummaryField
+
+    sources = [field.source for field in serializer.fields.values() if isinstance(field, UserSummaryField)]
+    if sources:
+        get_loader(serializer.context).prime({_value(item, source) for item in items for source in sources})
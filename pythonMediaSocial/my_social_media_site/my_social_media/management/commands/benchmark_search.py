@@ -0,0 +1,33 @@
+import statistics
+import time
+from django.core.management.base import BaseCommand
+from my_social_media.models import Post, SearchToken
+from my_social_media import search
+
+
+class Command(BaseCommand):
+    help = 'Đo thời gian tìm kiếm post trên dữ liệu hiện có trong DB'
+
+    def add_arguments(self, parser):
+        parser.add_argument('queries', nargs='*', default=['viet', 'sinh vien', 'hoc bong', 'cuu sinh vien 2024'])
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--limit', type=int, default=20)
+
+    def handle(self, *args, **options):
+        self.stdout.write('posts=%d tokens=%d' % (Post.objects.count(), SearchToken.objects.count()))
+        base = Post.objects.filter(active=True)
+
+        for q in options['queries']:
+            timings = []
+            found = 0
+            for _ in range(options['repeat']):
+                start = time.perf_counter()
+                found = len(list(search.search_posts(base, q).order_by(*search.RANKED_ORDERING)[:options['limit']]))
+                timings.append((time.perf_counter() - start) * 1000)
+            timings.sort()
+            p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+            self.stdout.write('%-24s hits=%-4d p50=%.2fms p95=%.2fms max=%.2fms' % (
+                q, found, statistics.median(timings), p95, timings[-1]))
+
+        plan = search.search_posts(base, options['queries'][0]).order_by(*search.RANKED_ORDERING)[:options['limit']]
+        self.stdout.write(plan.explain())
@@ -0,0 +1,82 @@
+import statistics
+import time
+from django.core.management.base import BaseCommand
+from rest_framework.renderers import JSONRenderer
+from my_social_media.models import Post, Comment, Like, User
+from my_social_media.serializers import PostDetailsSerializer, CommentSerializer, LikeSerializer, \
+    UserSummarySerializer
+from my_social_media.renderers import FastJSONRenderer
+from my_social_media.loaders import UserSummaryLoader
+from my_social_media import fastpath
+
+KINDS = {
+    'posts': (Post.objects.filter(active=True), PostDetailsSerializer, fastpath.POSTS),
+    'comments': (Comment.objects.filter(active=True), CommentSerializer, fastpath.COMMENTS),
+    'likes': (Like.objects.all(), LikeSerializer, fastpath.LIKES),
+    'users': (User.objects.all(), UserSummarySerializer, None),
+}
+
+
+class Command(BaseCommand):
+    help = 'So sánh ModelSerializer + JSONRenderer với đường đọc nhanh (fastpath.py + FastJSONRenderer) ' \
+           'trên dữ liệu hiện có trong DB'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, nargs='+', default=[1000, 10000])
+        parser.add_argument('--kind', choices=sorted(KINDS), action='append', dest='kinds')
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        self.stdout.write('%-9s %6s %-6s %10s %12s %10s %10s %8s' % (
+            'kind', 'rows', 'path', 'fetch ms', 'serialize ms', 'render ms', 'total ms', 'speedup'))
+        for kind in options['kinds'] or sorted(KINDS):
+            queryset, serializer_class, plan = KINDS[kind]
+            for rows in options['rows']:
+                queryset_page = queryset.order_by('-id')
+                slow = self.measure(options['repeat'], lambda: self.run_serializer(queryset_page, serializer_class,
+                                                                                 rows))
+                fast = self.measure(options['repeat'], lambda: self.run_fastpath(queryset_page, plan, rows))
+                count = slow.pop('count')
+                fast.pop('count')
+                if count < rows:
+                    self.stdout.write(self.style.WARNING('%s: only %d rows in DB' % (kind, count)))
+                for name, result in (('drf', slow), ('fast', fast)):
+                    self.stdout.write('%-9s %6d %-6s %10.2f %12.2f %10.2f %10.2f %8s' % (
+                        kind, count, name, result['fetch'], result['serialize'], result['render'], result['total'],
+                        '%.1fx' % (slow['total'] / result['total']) if result['total'] else '-'))
+
+    def measure(self, repeat, run):
+        samples = [run() for _ in range(max(1, repeat))]
+        result = {key: statistics.median(sample[key] for sample in samples)
+                  for key in ('fetch', 'serialize', 'render')}
+        result['total'] = result['fetch'] + result['serialize'] + result['render']
+        result['count'] = samples[0]['count']
+        return result
+
+    def run_serializer(self, queryset, serializer_class, rows):
+        start = time.perf_counter()
+        instances = list(serializer_class.setup_eager_loading(queryset, None)[:rows]) \
+            if hasattr(serializer_class, 'setup_eager_loading') else list(queryset[:rows])
+        fetched = time.perf_counter()
+        data = serializer_class(instances, many=True, context={}).data
+        serialized = time.perf_counter()
+        JSONRenderer().render(data)
+        return self.timings(start, fetched, serialized, time.perf_counter(), len(instances))
+
+    def run_fastpath(self, queryset, plan, rows):
+        start = time.perf_counter()
+        if plan is None:
+            page = list(queryset.values(*fastpath.USER_SUMMARY_COLUMNS)[:rows])
+            fetched = time.perf_counter()
+            data = [fastpath.user_summary(row) for row in page]
+        else:
+            page = list(fastpath.rows(queryset, plan)[:rows])
+            fetched = time.perf_counter()
+            data = plan.build(page, UserSummaryLoader())
+        serialized = time.perf_counter()
+        FastJSONRenderer().render(data)
+        return self.timings(start, fetched, serialized, time.perf_counter(), len(page))
+
+    def timings(self, start, fetched, serialized, rendered, count):
+        return {'fetch': (fetched - start) * 1000, 'serialize': (serialized - fetched) * 1000,
+                'render': (rendered - serialized) * 1000, 'count': count}
@@ -0,0 +1,34 @@
+import sys
+import time
+import tracemalloc
+from django.core.management.base import BaseCommand
+from my_social_media import exports
+
+
+class Command(BaseCommand):
+    help = 'Xuất posts/likes/comments/survey_results ra CSV hoặc JSON lines, in số dòng/giây và bộ nhớ tối đa'
+
+    def add_arguments(self, parser):
+        parser.add_argument('name', choices=sorted(exports.EXPORTS))
+        parser.add_argument('--format', choices=sorted(exports.FORMATS), default='csv')
+        parser.add_argument('--output', help='file đích, mặc định là stdout')
+        parser.add_argument('--chunk-size', type=int, default=exports.DEFAULT_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        out = open(options['output'], 'w', encoding='utf-8', newline='') if options['output'] else sys.stdout
+        tracemalloc.start()
+        start = time.perf_counter()
+        lines = 0
+        try:
+            for piece in exports.iter_export(options['name'], options['format'], chunk_size=options['chunk_size']):
+                out.write(piece)
+                lines += piece.count('\n')
+        finally:
+            if options['output']:
+                out.close()
+        elapsed = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        self.stderr.write('%d lines in %.2fs (%.0f lines/s), peak Python memory %.1f MiB' % (
+            lines, elapsed, lines / elapsed if elapsed else 0, peak / 1024 / 1024))
@@ -0,0 +1,58 @@
+import os
+import time
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError
+from my_social_media import imports
+
+
+class Command(BaseCommand):
+    help = 'Nhập users/memberships/posts/comments/likes từ CSV hoặc JSON lines bằng bulk_create theo từng đoạn, ' \
+           'vd. import_data users=users.csv posts=posts.jsonl likes=likes.csv. Password phải là hash sẵn ' \
+           '(make_password), comment phải có id, ngày trong file được giữ nguyên. Không chạy signal nên sau khi ' \
+           'nhập sẽ dựng lại bộ đếm, timeline, search index và DailyStat (trừ khi --skip-rebuild)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('sources', nargs='+', metavar='name=path',
+                            help='name là một trong: %s' % ', '.join(imports.IMPORTS))
+        parser.add_argument('--format', choices=imports.FORMATS, help='mặc định đoán theo đuôi file')
+        parser.add_argument('--chunk-size', type=int, default=imports.DEFAULT_CHUNK_SIZE)
+        parser.add_argument('--ignore-conflicts', action='store_true',
+                            help='bỏ qua dòng trùng khóa (chạy lại sau khi lỗi giữa chừng)')
+        parser.add_argument('--skip-rebuild', action='store_true')
+
+    def handle(self, *args, **options):
+        sources = {}
+        for source in options['sources']:
+            name, sep, path = source.partition('=')
+            if not sep or name not in imports.IMPORTS:
+                raise CommandError('source phải có dạng name=path với name trong %s: %s' % (
+                    ', '.join(imports.IMPORTS), source))
+            fmt = options['format'] or os.path.splitext(path)[1].lstrip('.').lower()
+            if fmt not in imports.FORMATS:
+                raise CommandError('Không đoán được định dạng của %s, dùng --format' % path)
+            sources[name] = (path, fmt)
+
+        # nhập theo thứ tự của IMPORTS (memberships -> users -> posts -> comments/likes) dù truyền theo thứ tự nào
+        for name in imports.IMPORTS:
+            if name not in sources:
+                continue
+            path, fmt = sources[name]
+            start = time.perf_counter()
+            rows = 0
+            try:
+                for rows in imports.import_rows(name, imports.iter_rows(path, fmt), chunk_size=options['chunk_size'],
+                                                ignore_conflicts=options['ignore_conflicts']):
+                    if self.stderr.isatty():
+                        self.stderr.write('%s: %d rows' % (name, rows), ending='\r')
+            # mỗi đoạn commit riêng nên các đoạn trước chỗ lỗi đã nằm trong DB
+            except (imports.DataImportError, IntegrityError) as e:
+                raise CommandError('%s: %s (%d rows of this file already imported, rerun with --ignore-conflicts '
+                                   'after fixing)' % (name, e, rows))
+            elapsed = time.perf_counter() - start
+            self.stdout.write('%-16s %9d rows in %.2fs (%.0f rows/min)' % (
+                name, rows, elapsed, rows / elapsed * 60 if elapsed else 0))
+
+        if not options['skip_rebuild']:
+            for name in imports.REBUILD_COMMANDS:
+                call_command(name, stdout=self.stdout)
@@ -0,0 +1,185 @@
+import json
+import math
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urljoin
+import requests
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from my_social_media.models import Answer, LikeType, Post
+
+DEFAULT_TARGETS = ['wsgi=http://127.0.0.1:8000/', 'asgi=http://127.0.0.1:8001/async/']
+DEFAULT_PATHS = ['posts/', 'posts/1/', 'posts/1/comments/', 'posts/1/likes/', 'users/1/profile/']
+# số post/answer đọc từ DB để chọn ngẫu nhiên, post nhiều like hơn được chọn nhiều hơn (Zipf theo thứ hạng)
+SAMPLE_SIZE = 1000
+
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, max(0, math.ceil(p / 100 * len(sorted_values)) - 1))]
+
+
+# kịch bản ghi/đọc theo user: (method, path, data) cho request thứ i, rng riêng mỗi request nên cùng --seed
+# là cùng chuỗi request dù thread chạy theo thứ tự nào. SQLite chỉ cho 1 transaction ghi tại 1 thời điểm nên
+# like/vote đồng thời sẽ lỗi "database is locked", đo kịch bản ghi trên MySQL
+def feed_request(rng, ids):
+    return 'get', 'feed/', None
+
+
+def like_request(rng, ids):
+    return 'post', 'posts/%d/like/' % ids.post(rng), {'type_of_like': rng.choice(ids.like_types)}
+
+
+def comment_request(rng, ids):
+    return 'post', 'posts/%d/add_comment/' % ids.post(rng), {'comment': 'loadtest %d' % rng.randrange(10 ** 6)}
+
+
+def vote_request(rng, ids):
+    return 'patch', 'answers/%d/plus_quantity/' % rng.choice(ids.answers), None
+
+
+SCENARIOS = {
+    'feed': feed_request,
+    'like': like_request,
+    'comment': comment_request,
+    'vote': vote_request,
+}
+
+
+class SampleIds:
+    def __init__(self):
+        self.posts = list(Post.objects.filter(active=True).order_by('-like_count', '-id')
+                          .values_list('pk', flat=True)[:SAMPLE_SIZE])
+        self.post_weights = [1 / (rank + 1) for rank in range(len(self.posts))]
+        self.answers = list(Answer.objects.order_by('-id').values_list('pk', flat=True)[:SAMPLE_SIZE])
+        self.like_types = list(LikeType.objects.values_list('pk', flat=True))
+
+    def post(self, rng):
+        return rng.choices(self.posts, weights=self.post_weights)[0]
+
+
+class Command(BaseCommand):
+    help = 'Bắn request đồng thời vào các endpoint và báo req/s, p50/p95/p99. Mặc định so sánh các endpoint đọc ' \
+           'giữa bản WSGI và ASGI (gunicorn my_social_media_site.wsgi -b :8000, uvicorn ' \
+           'my_social_media_site.asgi:application --port 8001). --scenario feed/like/comment/vote chạy các ' \
+           'thao tác của user đã đăng nhập với token từ seed_synthetic (--tokens-file), id post/answer lấy từ DB ' \
+           'của settings. --output lưu kết quả JSON, --baseline so với lần chạy trước'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--target', action='append', dest='targets',
+                            help='name=base_url, lặp lại để so sánh (mặc định: %s)' % ', '.join(DEFAULT_TARGETS))
+        parser.add_argument('--path', action='append', dest='paths',
+                            help='path tương đối với base_url (mặc định: %s)' % ', '.join(DEFAULT_PATHS))
+        parser.add_argument('--scenario', action='append', dest='scenarios', choices=sorted(SCENARIOS),
+                            help='chạy kịch bản thay cho --path')
+        parser.add_argument('--concurrency', type=int, default=50)
+        parser.add_argument('--requests', type=int, default=1000, help='số request cho mỗi path/kịch bản')
+        parser.add_argument('--token', help='OAuth2 access token gửi kèm header Authorization')
+        parser.add_argument('--tokens-file', help='mỗi dòng 1 token, mỗi request dùng 1 token ngẫu nhiên')
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--timeout', type=float, default=30)
+        parser.add_argument('--output', help='ghi kết quả ra file JSON')
+        parser.add_argument('--baseline', help='file JSON của lần chạy trước để so sánh')
+        parser.add_argument('--max-regression', type=float,
+                            help='báo lỗi nếu p95 chậm hơn baseline quá bấy nhiêu phần trăm')
+
+    def handle(self, *args, **options):
+        scenarios = options['scenarios'] or []
+        # view async chỉ có endpoint đọc nên mặc định kịch bản chỉ chạy trên target đầu (WSGI)
+        targets = []
+        for target in options['targets'] or (DEFAULT_TARGETS[:1] if scenarios else DEFAULT_TARGETS):
+            name, sep, url = target.partition('=')
+            if not sep or not url:
+                raise CommandError('--target phải có dạng name=base_url: %s' % target)
+            targets.append((name, url if url.endswith('/') else url + '/'))
+
+        tokens = [options['token']] if options['token'] else []
+        if options['tokens_file']:
+            with open(options['tokens_file']) as f:
+                tokens += [line.strip() for line in f if line.strip()]
+        if scenarios and not tokens:
+            raise CommandError('--scenario cần --token hoặc --tokens-file')
+        ids = SampleIds() if scenarios else None
+        if ids is not None and (not ids.posts or not ids.like_types):
+            raise CommandError('Không có post/like type trong DB, chạy seed_synthetic trước')
+        if 'vote' in scenarios and not ids.answers:
+            raise CommandError('Không có answer trong DB, chạy seed_synthetic trước')
+        baseline = self.load_baseline(options['baseline'])
+
+        self.stdout.write('%-8s %-24s %7s %6s %9s %9s %9s %9s %8s' % (
+            'target', 'path', 'ok', 'err', 'req/s', 'p50 ms', 'p95 ms', 'p99 ms', 'p95 Δ%'))
+        results = []
+        regressions = []
+        for name, base_url in targets:
+            if scenarios:
+                runs = [(scenario, SCENARIOS[scenario]) for scenario in scenarios]
+            else:
+                runs = [(path, lambda rng, ids, path=path: ('get', path, None))
+                        for path in options['paths'] or DEFAULT_PATHS]
+            for label, build in runs:
+                result = self.run(base_url, build, ids, tokens, options)
+                result.update(target=name, path=label)
+                previous = baseline.get((name, label))
+                change = (result['p95'] - previous['p95']) / previous['p95'] * 100 \
+                    if previous and previous['p95'] else None
+                if change is not None and options['max_regression'] is not None \
+                        and change > options['max_regression']:
+                    regressions.append('%s %s' % (name, label))
+                results.append(result)
+                self.stdout.write('%-8s %-24s %7d %6d %9.1f %9.2f %9.2f %9.2f %8s' % (
+                    name, label, result['ok'], result['errors'], result['rps'],
+                    result['p50'], result['p95'], result['p99'], '%+.1f' % change if change is not None else '-'))
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump({'created': timezone.now().isoformat(), 'concurrency': options['concurrency'],
+                           'requests': options['requests'], 'seed': options['seed'], 'results': results}, f, indent=2)
+        if regressions:
+            raise CommandError('p95 regressed more than %s%% in: %s' % (options['max_regression'],
+                                                                       ', '.join(regressions)))
+
+    def load_baseline(self, path):
+        if not path:
+            return {}
+        with open(path) as f:
+            return {(row['target'], row['path']): row for row in json.load(f)['results']}
+
+    def run(self, base_url, build, ids, tokens, options):
+        total, concurrency = options['requests'], max(1, options['concurrency'])
+        local = threading.local()
+        timings, errors = [], []
+
+        # mỗi worker thread giữ 1 Session để dùng lại kết nối keep-alive
+        def fetch(i):
+            if not hasattr(local, 'session'):
+                local.session = requests.Session()
+            rng = random.Random('%d:%d' % (options['seed'], i))
+            method, path, data = build(rng, ids)
+            headers = {'Authorization': 'Bearer %s' % rng.choice(tokens)} if tokens else {}
+            start = time.perf_counter()
+            try:
+                response = local.session.request(method, urljoin(base_url, path), json=data, headers=headers,
+                                                 timeout=options['timeout'])
+                ok = response.status_code < 400
+            except requests.RequestException:
+                ok = False
+            elapsed = (time.perf_counter() - start) * 1000
+            (timings if ok else errors).append(elapsed)
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            list(executor.map(fetch, range(total)))
+        duration = time.perf_counter() - start
+
+        timings.sort()
+        return {
+            'ok': len(timings),
+            'errors': len(errors),
+            'rps': total / duration if duration else 0.0,
+            'p50': percentile(timings, 50),
+            'p95': percentile(timings, 95),
+            'p99': percentile(timings, 99),
+        }
@@ -0,0 +1,42 @@
+import time
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from my_social_media.models import UploadJob
+from my_social_media import uploads
+
+
+class Command(BaseCommand):
+    help = 'Upload các file avatar/cover_photo đang chờ lên Cloudinary (worker cho bảng UploadJob)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--retry-failed', action='store_true', help='đưa các job failed về pending để thử lại')
+        parser.add_argument('--stale-minutes', type=int, default=30,
+                            help='job running quá số phút này (worker chết giữa chừng) được đưa về pending')
+        parser.add_argument('--loop', type=float, metavar='SECONDS',
+                            help='chạy liên tục, hết job thì chờ SECONDS giây rồi đọc lại')
+
+    def handle(self, *args, **options):
+        if options['retry_failed']:
+            count = UploadJob.objects.filter(status=UploadJob.FAILED).update(status=UploadJob.PENDING, attempts=0)
+            self.stdout.write('Requeued %d failed jobs' % count)
+
+        while True:
+            stale = timezone.now() - timedelta(minutes=options['stale_minutes'])
+            UploadJob.objects.filter(status=UploadJob.RUNNING, updated_date__lt=stale).update(status=UploadJob.PENDING)
+
+            done = failed = 0
+            for job_id in list(UploadJob.objects.filter(status=UploadJob.PENDING).order_by('id')
+                               .values_list('pk', flat=True)):
+                job = uploads.process(job_id)
+                if job is None:
+                    continue
+                if job.status == UploadJob.DONE:
+                    done += 1
+                else:
+                    failed += 1
+            if done or failed or not options['loop']:
+                self.stdout.write('Uploaded %d files, %d failed' % (done, failed))
+            if not options['loop']:
+                break
+            time.sleep(options['loop'])
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count
+from django.db.models.functions import TruncDate
+from my_social_media.models import DailyStat, Post, User
+
+
+class Command(BaseCommand):
+    help = 'Tính lại bảng DailyStat từ bảng Post và User'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            DailyStat.objects.all().delete()
+            posts = Post.objects.filter(created_date__isnull=False).order_by() \
+                .values('created_date').annotate(total=Count('id'))
+            users = User.objects.order_by().values(joined=TruncDate('date_joined')).annotate(total=Count('id'))
+            rows = [DailyStat(metric=DailyStat.POSTS, day=row['created_date'], count=row['total']) for row in posts]
+            rows += [DailyStat(metric=DailyStat.USERS, day=row['joined'], count=row['total']) for row in users]
+            DailyStat.objects.bulk_create(rows, batch_size=1000)
+
+        self.stdout.write(self.style.SUCCESS('Wrote %d daily rows' % len(rows)))
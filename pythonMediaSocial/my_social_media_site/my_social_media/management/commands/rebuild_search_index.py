@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from my_social_media.models import Post, Comment, SearchToken
+from my_social_media import search
+
+
+class Command(BaseCommand):
+    help = 'Dựng lại bảng SearchToken cho toàn bộ Post và Comment đang active'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        tokens = 0
+
+        with transaction.atomic():
+            SearchToken.objects.all().delete()
+
+            rows = []
+            for post in Post.objects.filter(active=True).only('pk', 'title', 'content').iterator(chunk_size=batch_size):
+                rows += search.token_rows([(post.title, search.TITLE_WEIGHT),
+                                      (search.html_to_text(post.content), search.CONTENT_WEIGHT)], post.pk)
+                if len(rows) >= batch_size:
+                    SearchToken.objects.bulk_create(rows, batch_size=batch_size)
+                    tokens += len(rows)
+                    rows = []
+
+            comments = Comment.objects.filter(active=True).only('pk', 'post_id', 'comment')
+            for comment in comments.iterator(chunk_size=batch_size):
+                rows += search.token_rows([(comment.comment, search.COMMENT_WEIGHT)], comment.post_id, comment.pk)
+                if len(rows) >= batch_size:
+                    SearchToken.objects.bulk_create(rows, batch_size=batch_size)
+                    tokens += len(rows)
+                    rows = []
+            SearchToken.objects.bulk_create(rows, batch_size=batch_size)
+            tokens += len(rows)
+
+        self.stdout.write(self.style.SUCCESS('Indexed %d tokens' % tokens))
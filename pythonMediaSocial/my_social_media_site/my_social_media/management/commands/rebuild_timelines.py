@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from my_social_media.models import Post, User, TimelineEntry
+from my_social_media import timeline
+
+
+class Command(BaseCommand):
+    help = 'Tính lại nhóm nào fan-out theo số thành viên và dựng lại toàn bộ bảng TimelineEntry từ ' \
+           'Post.membership và User.membership'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=timeline.BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        through = Post.membership.through
+        created = 0
+
+        with transaction.atomic():
+            small, large = timeline.reset_fan_out()
+            TimelineEntry.objects.all().delete()
+
+            batch = []
+            for post_id, user_id in Post.objects.values_list('pk', 'created_by_id').iterator(chunk_size=batch_size):
+                batch.append(TimelineEntry(user_id=user_id, post_id=post_id))
+                if len(batch) >= batch_size:
+                    TimelineEntry.objects.bulk_create(batch, ignore_conflicts=True)
+                    created += len(batch)
+                    batch = []
+
+            for group_id in small:
+                member_ids = list(User.objects.filter(membership=group_id).values_list('pk', flat=True))
+                post_ids = through.objects.filter(membership_id=group_id).values_list('post_id', flat=True)
+                for post_id in post_ids.iterator(chunk_size=batch_size):
+                    batch.extend(TimelineEntry(user_id=user_id, post_id=post_id) for user_id in member_ids)
+                    if len(batch) >= batch_size:
+                        TimelineEntry.objects.bulk_create(batch, ignore_conflicts=True)
+                        created += len(batch)
+                        batch = []
+            TimelineEntry.objects.bulk_create(batch, ignore_conflicts=True)
+            created += len(batch)
+
+        self.stdout.write(self.style.SUCCESS(
+            'Wrote %d timeline rows (%d fan-out groups, %d read-time groups)' % (created, len(small), len(large))))
@@ -0,0 +1,58 @@
+from collections import defaultdict
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from my_social_media.models import Post, Like, Comment, PostReaction
+from my_social_media import threads
+
+
+def _count_subquery(queryset):
+    counted = queryset.order_by().values('post').annotate(total=Count('id')).values('total')
+    return Coalesce(Subquery(counted, output_field=IntegerField()), 0)
+
+
+class Command(BaseCommand):
+    help = 'Tính lại like_count, comment_count và PostReaction từ bảng Like/Comment'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+
+        with transaction.atomic():
+            # 1 câu UPDATE cho toàn bộ bảng Post
+            updated = Post.objects.update(
+                like_count=_count_subquery(Like.objects.filter(post=OuterRef('pk'), active=True)),
+                comment_count=_count_subquery(Comment.objects.filter(post=OuterRef('pk'), active=True)),
+            )
+
+            PostReaction.objects.all().delete()
+            rows = Like.objects.filter(active=True).order_by() \
+                .values('post_id', 'type_of_like_id').annotate(total=Count('id'))
+            batch = []
+            reactions = 0
+            for row in rows.iterator(chunk_size=batch_size):
+                batch.append(PostReaction(post_id=row['post_id'], type_of_like_id=row['type_of_like_id'],
+                                          count=row['total']))
+                if len(batch) >= batch_size:
+                    PostReaction.objects.bulk_create(batch)
+                    reactions += len(batch)
+                    batch = []
+            PostReaction.objects.bulk_create(batch)
+            reactions += len(batch)
+
+            # reply_count: mỗi reply active cộng 1 cho mọi comment tổ tiên (đọc từ path). Không dùng UPDATE với
+            # subquery trên chính bảng Comment vì MySQL không cho
+            reply_counts = defaultdict(int)
+            for path in Comment.objects.filter(active=True).exclude(parent=None).values_list('path', flat=True) \
+                    .iterator(chunk_size=batch_size):
+                for ancestor_id in threads.ancestor_ids(path):
+                    reply_counts[ancestor_id] += 1
+            Comment.objects.exclude(reply_count=0).update(reply_count=0)
+            Comment.objects.bulk_update([Comment(pk=pk, reply_count=count) for pk, count in reply_counts.items()],
+                                        ['reply_count'], batch_size=batch_size)
+
+        self.stdout.write(self.style.SUCCESS(
+            'Reconciled %d posts, %d reaction rows and %d comment threads' % (updated, reactions, len(reply_counts))))
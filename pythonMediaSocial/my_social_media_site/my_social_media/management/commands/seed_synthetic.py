@@ -0,0 +1,246 @@
+import random
+import secrets
+from collections import Counter
+from datetime import timedelta
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+from oauth2_provider.models import get_access_token_model, get_application_model
+from my_social_media.models import (Answer, Comment, Like, LikeType, Membership, Post, PostType, Question, Survey,
+                                    User, Vote)
+from my_social_media import imports, threads
+
+DEFAULT_LIKE_TYPES = ['Like', 'Love', 'Haha', 'Wow', 'Sad', 'Angry']
+DEFAULT_POST_TYPES = ['Thông báo', 'Thảo luận', 'Tuyển dụng']
+WORDS = ['sinh', 'vien', 'cuu', 'truong', 'hop', 'lop', 'khoa', 'tuyen', 'dung', 'viec', 'lam', 'chia', 'se',
+         'kinh', 'nghiem', 'thuc', 'tap', 'hoc', 'bong', 'su', 'kien', 'gap', 'mat', 'ky', 'niem', 'thay', 'co']
+
+
+# trọng số kiểu Zipf: phần tử thứ i (sau khi xáo) có trọng số 1 / (i + 1)^alpha, vài user/post rất "hot",
+# phần lớn còn lại rất ít tương tác
+def zipf_weights(n, alpha, rng):
+    weights = [1 / (rank + 1) ** alpha for rank in range(n)]
+    rng.shuffle(weights)
+    return weights
+
+
+# chia total tương tác cho n phần tử theo trọng số, mỗi phần tử tối đa cap
+def allocate(total, weights, cap, rng):
+    counts = Counter(rng.choices(range(len(weights)), weights=weights, k=total))
+    return [min(counts[i], cap) for i in range(len(weights))]
+
+
+class Command(BaseCommand):
+    help = 'Sinh dữ liệu giả lập (user, nhóm, post, like/comment phân phối luỹ thừa, survey + phiếu) bằng ' \
+           'bulk_create, cấp OAuth2 token cho loadtest rồi dựng lại bộ đếm/timeline/search/thống kê. ' \
+           'Cùng --seed cho ra cùng dữ liệu'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--groups', type=int, default=20)
+        parser.add_argument('--posts', type=int, default=5000)
+        parser.add_argument('--likes', type=int, default=50000, help='tổng số like, chia cho các post theo Zipf')
+        parser.add_argument('--comments', type=int, default=20000)
+        parser.add_argument('--reply-ratio', type=float, default=0.3, help='tỉ lệ comment là reply của comment khác')
+        parser.add_argument('--surveys', type=int, default=20)
+        parser.add_argument('--alpha', type=float, default=1.1, help='số mũ của phân phối Zipf')
+        parser.add_argument('--days', type=int, default=365, help='trải ngày tạo post/user trên bấy nhiêu ngày')
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--prefix', default='seed', help='tiền tố username')
+        parser.add_argument('--password', default='loadtest')
+        parser.add_argument('--tokens', type=int, default=100, help='số user được cấp access token')
+        parser.add_argument('--tokens-file', default='loadtest_tokens.txt')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--skip-rebuild', action='store_true')
+
+    def handle(self, *args, **options):
+        if User.objects.filter(username__startswith='%s_' % options['prefix']).exists():
+            raise CommandError('Users with prefix "%s_" already exist, use another --prefix' % options['prefix'])
+        if options['users'] < 1 or options['posts'] < 1:
+            raise CommandError('--users and --posts must be positive')
+
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        self.now = timezone.now()
+
+        with transaction.atomic():
+            like_types = self.ensure_types(LikeType, DEFAULT_LIKE_TYPES)
+            post_types = self.ensure_types(PostType, DEFAULT_POST_TYPES)
+            user_ids = self.create_users(options)
+            user_groups = self.create_groups(options, user_ids)
+            post_ids = self.create_posts(options, user_ids, user_groups, post_types)
+            likes = self.create_likes(options, user_ids, post_ids, like_types)
+            comments = self.create_comments(options, user_ids, post_ids)
+            votes = self.create_surveys(options, user_ids)
+            tokens = self.create_tokens(options, user_ids)
+
+        self.stdout.write(self.style.SUCCESS(
+            'Created %d users, %d groups, %d posts, %d likes, %d comments, %d surveys (%d votes), %d tokens' % (
+                len(user_ids), options['groups'], len(post_ids), likes, comments, options['surveys'], votes,
+                len(tokens))))
+        if tokens:
+            with open(options['tokens_file'], 'w') as f:
+                f.write('\n'.join(tokens) + '\n')
+            self.stdout.write('Access tokens written to %s (loadtest --tokens-file)' % options['tokens_file'])
+
+        if not options['skip_rebuild']:
+            for name in imports.REBUILD_COMMANDS:
+                call_command(name, stdout=self.stdout)
+
+    def ensure_types(self, model, names):
+        if not model.objects.exists():
+            model.objects.bulk_create([model(name_type=name) for name in names])
+        return list(model.objects.order_by('id').values_list('pk', flat=True))
+
+    # MySQL không trả id sau bulk_create: command chạy 1 mình trong transaction nên id mới là các id > max cũ,
+    # theo đúng thứ tự insert
+    def bulk_insert(self, model, objects):
+        last_id = model.objects.aggregate(last=Max('id'))['last'] or 0
+        model.objects.bulk_create(objects, batch_size=self.batch_size)
+        return list(model.objects.filter(pk__gt=last_id).order_by('id').values_list('pk', flat=True))
+
+    def sentence(self, words):
+        return ' '.join(self.rng.choice(WORDS) for _ in range(words))
+
+    # ngày gần đây nhiều hơn: độ lùi = days * u^2
+    def days_ago(self, days):
+        return int(days * self.rng.random() ** 2)
+
+    def create_users(self, options):
+        password = make_password(options['password'])
+        users = []
+        for i in range(options['users']):
+            users.append(User(username='%s_%d' % (options['prefix'], i), password=password, is_active=True,
+                              first_name=self.rng.choice(WORDS).title(), last_name=self.rng.choice(WORDS).title(),
+                              email='%s_%d@example.com' % (options['prefix'], i),
+                              date_joined=self.now - timedelta(days=self.days_ago(options['days']))))
+        return self.bulk_insert(User, users)
+
+    # kích thước nhóm cũng theo Zipf: vài nhóm lớn (đọc lúc request), nhiều nhóm nhỏ (fan-out)
+    def create_groups(self, options, user_ids):
+        if options['groups'] <= 0:
+            return {}
+        group_ids = self.bulk_insert(Membership, [Membership(group_name='%s group %d' % (options['prefix'], i))
+                                                  for i in range(options['groups'])])
+        sizes = allocate(len(user_ids) * 2, zipf_weights(len(group_ids), options['alpha'], self.rng),
+                         len(user_ids), self.rng)
+        through = User.membership.through
+        user_groups = {}
+        rows = []
+        for group_id, size in zip(group_ids, sizes):
+            for user_id in self.rng.sample(user_ids, max(1, size)):
+                user_groups.setdefault(user_id, []).append(group_id)
+                rows.append(through(user_id=user_id, membership_id=group_id))
+        through.objects.bulk_create(rows, batch_size=self.batch_size)
+        return user_groups
+
+    def create_posts(self, options, user_ids, user_groups, post_types):
+        authors = self.rng.choices(user_ids, weights=zipf_weights(len(user_ids), options['alpha'], self.rng),
+                                   k=options['posts'])
+        posts = [Post(title=self.sentence(6).capitalize(), content='<p>%s</p>' % self.sentence(40),
+                      type_of_post_id=self.rng.choice(post_types), created_by_id=author) for author in authors]
+        post_ids = self.bulk_insert(Post, posts)
+
+        # created_date là auto_now_add nên gán lại sau khi insert, mỗi ngày 1 câu UPDATE
+        by_day = {}
+        for post_id in post_ids:
+            by_day.setdefault(self.days_ago(options['days']), []).append(post_id)
+        today = self.now.date()
+        for offset, ids in by_day.items():
+            for start in range(0, len(ids), self.batch_size):
+                Post.objects.filter(pk__in=ids[start:start + self.batch_size]) \
+                    .update(created_date=today - timedelta(days=offset))
+
+        # 1/3 số post được chia sẻ vào 1 nhóm của tác giả
+        through = Post.membership.through
+        rows = [through(post_id=post_id, membership_id=self.rng.choice(user_groups[author]))
+                for post_id, author in zip(post_ids, authors) if author in user_groups and self.rng.random() < 0.33]
+        through.objects.bulk_create(rows, batch_size=self.batch_size)
+        return post_ids
+
+    def create_likes(self, options, user_ids, post_ids, like_types):
+        counts = allocate(options['likes'], zipf_weights(len(post_ids), options['alpha'], self.rng),
+                          len(user_ids), self.rng)
+        # "Like" chiếm đa số, các reaction khác hiếm dần
+        type_weights = [1 / (rank + 1) ** 1.5 for rank in range(len(like_types))]
+        batch = []
+        created = 0
+        for post_id, count in zip(post_ids, counts):
+            for user_id in self.rng.sample(user_ids, count):
+                batch.append(Like(user_id=user_id, post_id=post_id,
+                                  type_of_like_id=self.rng.choices(like_types, weights=type_weights)[0]))
+            if len(batch) >= self.batch_size:
+                Like.objects.bulk_create(batch, batch_size=self.batch_size)
+                created += len(batch)
+                batch = []
+        Like.objects.bulk_create(batch, batch_size=self.batch_size)
+        return created + len(batch)
+
+    # comment gốc trước (path gán bằng 1 UPDATE), rồi reply cấp 1 với path = path cha + id tính ở Python
+    def create_comments(self, options, user_ids, post_ids):
+        total = options['comments']
+        replies = int(total * options['reply_ratio'])
+        counts = allocate(total - replies, zipf_weights(len(post_ids), options['alpha'], self.rng), total, self.rng)
+        user_weights = zipf_weights(len(user_ids), options['alpha'], self.rng)
+        roots = [Comment(user_id=user_id, post_id=post_id, comment=self.sentence(8))
+                 for post_id, count in zip(post_ids, counts) if count
+                 for user_id in self.rng.choices(user_ids, weights=user_weights, k=count)]
+        root_ids = self.bulk_insert(Comment, roots)
+        for start in range(0, len(root_ids), self.batch_size):
+            threads.assign_root_paths(root_ids[start:start + self.batch_size])
+        if not root_ids or not replies:
+            return len(root_ids)
+
+        parents = self.rng.choices(list(zip(root_ids, roots)),
+                                   weights=zipf_weights(len(root_ids), options['alpha'], self.rng), k=replies)
+        reply_ids = self.bulk_insert(Comment, [
+            Comment(user_id=user_id, post_id=parent.post_id, comment=self.sentence(6), parent_id=parent_id, depth=1)
+            for (parent_id, parent), user_id in zip(parents, self.rng.choices(user_ids, weights=user_weights,
+                                                                             k=replies))])
+        Comment.objects.bulk_update([Comment(pk=pk, path=threads.segment(parent_id) + threads.segment(pk))
+                                     for pk, (parent_id, _) in zip(reply_ids, parents)],
+                                    ['path'], batch_size=self.batch_size)
+        return len(root_ids) + len(reply_ids)
+
+    # mỗi survey 1-5 câu hỏi, 2-4 đáp án; quantity của Answer bằng đúng số Vote
+    def create_surveys(self, options, user_ids):
+        if options['surveys'] <= 0:
+            return 0
+        survey_ids = self.bulk_insert(Survey, [
+            Survey(title=self.sentence(5).capitalize(), description='<p>%s</p>' % self.sentence(20),
+                   created_by_id=self.rng.choice(user_ids)) for _ in range(options['surveys'])])
+        question_survey_ids = [survey_id for survey_id in survey_ids for _ in range(self.rng.randint(1, 5))]
+        question_ids = self.bulk_insert(Question, [Question(content=self.sentence(6) + '?', survey_id=survey_id)
+                                                   for survey_id in question_survey_ids])
+
+        answers, votes = [], []
+        for question_id in question_ids:
+            choices = self.rng.randint(2, 4)
+            weights = zipf_weights(choices, options['alpha'], self.rng)
+            voters = self.rng.sample(user_ids, self.rng.randint(0, len(user_ids) // 2))
+            picks = self.rng.choices(range(choices), weights=weights, k=len(voters))
+            tally = Counter(picks)
+            offset = len(answers)
+            answers += [Answer(content=self.sentence(3), questions_id=question_id, quantity=tally[i])
+                        for i in range(choices)]
+            votes += [(user_id, question_id, offset + pick) for user_id, pick in zip(voters, picks)]
+        answer_ids = self.bulk_insert(Answer, answers)
+        Vote.objects.bulk_create([Vote(user_id=user_id, question_id=question_id, answer_id=answer_ids[index])
+                                  for user_id, question_id, index in votes], batch_size=self.batch_size)
+        return len(votes)
+
+    # token của các user đầu tiên, đủ hạn cho 1 buổi chạy loadtest
+    def create_tokens(self, options, user_ids):
+        if options['tokens'] <= 0:
+            return []
+        application, _ = get_application_model().objects.get_or_create(
+            name='loadtest', defaults={'client_type': 'confidential', 'authorization_grant_type': 'password'})
+        tokens = [secrets.token_urlsafe(30) for _ in user_ids[:options['tokens']]]
+        get_access_token_model().objects.bulk_create([
+            get_access_token_model()(user_id=user_id, application=application, token=token,
+                                     expires=self.now + timedelta(days=1), scope='read write')
+            for user_id, token in zip(user_ids, tokens)], batch_size=self.batch_size)
+        return tokens
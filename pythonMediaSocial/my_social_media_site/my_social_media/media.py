@@ -0,0 +1,42 @@
+import functools
+import re
+from cloudinary import CloudinaryResource
+from cloudinary.models import CLOUDINARY_FIELD_DB_RE
+from django.conf import settings
+
+# kích thước ảnh cho từng chỗ hiển thị, ghi đè bằng settings.IMAGE_VARIANTS
+DEFAULT_VARIANTS = {
+    'thumb': {'width': 96, 'height': 96, 'crop': 'fill', 'gravity': 'face', 'fetch_format': 'auto', 'quality': 'auto'},
+    'profile': {'width': 400, 'height': 400, 'crop': 'fill', 'gravity': 'face', 'fetch_format': 'auto',
+                'quality': 'auto'},
+    'cover': {'width': 1200, 'crop': 'limit', 'fetch_format': 'auto', 'quality': 'auto'},
+}
+
+
+def variants():
+    return getattr(settings, 'IMAGE_VARIANTS', DEFAULT_VARIANTS)
+
+
+# URL Cloudinary chỉ phụ thuộc giá trị lưu trong DB (có version nên upload ảnh mới là key mới) và variant,
+# nên cache trong process: 1 user xuất hiện nhiều lần trong feed/comment chỉ build URL 1 lần
+@functools.lru_cache(maxsize=getattr(settings, 'IMAGE_URL_CACHE_SIZE', 10000))
+def _build_url(value, variant):
+    m = re.match(CLOUDINARY_FIELD_DB_RE, value)
+    resource = CloudinaryResource(public_id=m.group('public_id'), format=m.group('format'),
+                                  version=m.group('version'), type=m.group('type') or 'upload',
+                                  resource_type=m.group('resource_type') or 'image')
+    return resource.build_url(**(variants()[variant] if variant else {}))
+
+
+def image_url(resource, variant=None):
+    if not resource:
+        return None
+    value = resource.get_prep_value() if isinstance(resource, CloudinaryResource) else str(resource)
+    if not value:
+        return None
+    return _build_url(value, variant)
+
+
+def url_cache_info():
+    info = _build_url.cache_info()
+    return {'hits': info.hits, 'misses': info.misses, 'size': info.currsize, 'max_size': info.maxsize}
@@ -0,0 +1,38 @@
+from asgiref.sync import iscoroutinefunction
+from django.utils.decorators import sync_and_async_middleware
+from . import loaders, profiling
+
+
+def _report_user_summaries(request, response):
+    stats = loaders.request_stats(request)
+    if stats is not None:
+        response['X-User-Summaries'] = 'requested=%(requested)d; unique=%(unique)d; collapsed=%(collapsed)d; ' \
+                                       'queries=%(queries)d' % stats
+        loaders.logger.debug('%s %s user summaries %s', request.method, request.path, stats)
+    return response
+
+
+# báo số user trùng lặp mà loader (loaders.py) đã gom lại trong request, chạy được cả với view async
+@sync_and_async_middleware
+def user_summary_stats_middleware(get_response):
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            return _report_user_summaries(request, await get_response(request))
+    else:
+        def middleware(request):
+            return _report_user_summaries(request, get_response(request))
+    return middleware
+
+
+# đo số query, thời gian DB/serialize và kích thước response theo view action (profiling.py), đặt đầu MIDDLEWARE
+@sync_and_async_middleware
+def profiling_middleware(get_response):
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            profile, token = profiling.start()
+            return profiling.finish(request, await get_response(request), profile, token)
+    else:
+        def middleware(request):
+            profile, token = profiling.start()
+            return profiling.finish(request, get_response(request), profile, token)
+    return middleware
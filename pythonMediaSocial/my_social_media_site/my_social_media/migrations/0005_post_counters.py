@@ -0,0 +1,36 @@
+# Generated by Django 5.0.4 on 2026-10-18 17:21
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('my_social_media', '0004_alter_post_is_comment'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='comment_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='like_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name='PostReaction',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('count', models.IntegerField(default=0)),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reactions', to='my_social_media.post')),
+                ('type_of_like', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='my_social_media.liketype')),
+            ],
+            options={
+                'unique_together': {('post', 'type_of_like')},
+            },
+        ),
+    ]
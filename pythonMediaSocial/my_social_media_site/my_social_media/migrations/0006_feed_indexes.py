@@ -0,0 +1,29 @@
+# Generated by Django 5.0.4 on 2026-10-18 17:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('my_social_media', '0005_post_counters'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['post', 'active', 'created_date', 'id'], name='comment_post_feed_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='like',
+            index=models.Index(fields=['post', 'created_date', 'id'], name='like_post_feed_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['active', 'created_date', 'id'], name='post_feed_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['created_by', 'active', 'created_date', 'id'], name='post_author_feed_idx'),
+        ),
+    ]
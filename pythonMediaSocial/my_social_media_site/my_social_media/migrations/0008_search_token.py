@@ -0,0 +1,27 @@
+# Generated by Django 5.0.4 on 2026-10-18 17:24
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('my_social_media', '0007_timeline_entry'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchToken',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('token', models.CharField(max_length=64)),
+                ('weight', models.IntegerField(default=1)),
+                ('comment', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='search_tokens', to='my_social_media.comment')),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_tokens', to='my_social_media.post')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['token', 'post'], name='search_token_idx')],
+            },
+        ),
+    ]
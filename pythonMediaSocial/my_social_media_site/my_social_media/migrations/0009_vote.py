@@ -0,0 +1,28 @@
+# Generated by Django 5.0.4 on 2026-10-18 17:25
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('my_social_media', '0008_search_token'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Vote',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_date', models.DateTimeField(auto_now_add=True)),
+                ('answer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='my_social_media.answer')),
+                ('question', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='my_social_media.question')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'unique_together': {('user', 'question')},
+            },
+        ),
+    ]
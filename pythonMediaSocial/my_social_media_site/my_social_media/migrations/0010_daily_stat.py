@@ -0,0 +1,25 @@
+# Generated by Django 5.0.4 on 2026-10-18 17:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('my_social_media', '0009_vote'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('metric', models.CharField(choices=[('posts', 'Posts'), ('users', 'Users')], max_length=20)),
+                ('day', models.DateField()),
+                ('count', models.IntegerField(default=0)),
+            ],
+            options={
+                'unique_together': {('metric', 'day')},
+            },
+        ),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 5.0.4 on 2026-10-18 17:42
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import CharField, Value
+from django.db.models.functions import Cast, Concat, LPad
+
+
+# comment cũ đều là comment gốc: path = id 10 chữ số + '/' (threads.segment)
+def fill_paths(apps, schema_editor):
+    Comment = apps.get_model('my_social_media', 'Comment')
+    Comment.objects.update(path=Concat(LPad(Cast('id', CharField()), 10, Value('0')), Value('/')))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('my_social_media', '0012_upload_job'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='comment',
+            name='comment_post_feed_idx',
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='depth',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='parent',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='replies', to='my_social_media.comment'),
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='path',
+            field=models.CharField(blank=True, default='', max_length=255),
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='reply_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(fill_paths, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['post', 'depth', 'active', 'created_date', 'id'], name='comment_post_root_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['post', 'path'], name='comment_thread_idx'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.0.4 on 2026-10-18 17:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('my_social_media', '0013_comment_threads'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='like',
+            index=models.Index(fields=['post', 'active', 'type_of_like'], name='like_post_active_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='uploadjob',
+            index=models.Index(fields=['user', 'field', 'id'], name='upload_job_user_idx'),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.0.4 on 2026-10-18 18:05
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+
+
+# nhóm đang vượt ngưỡng lúc migrate thì đọc lúc request như trước (timeline.max_group_size)
+def mark_large_groups(apps, schema_editor):
+    Membership = apps.get_model('my_social_media', 'Membership')
+    limit = getattr(settings, 'TIMELINE_FANOUT_MAX_GROUP_SIZE', 1000)
+    large = list(Membership.objects.annotate(member_count=Count('users'))
+                 .filter(member_count__gt=limit).values_list('pk', flat=True))
+    Membership.objects.filter(pk__in=large).update(fan_out=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('my_social_media', '0014_query_plan_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='membership',
+            name='fan_out',
+            field=models.BooleanField(default=True),
+        ),
+        migrations.RunPython(mark_large_groups, migrations.RunPython.noop),
+    ]
@@ -27,6 +27,9 @@ class Interaction(BaseModel):
 
 class Membership(BaseModel):
     group_name = models.CharField(max_length=200)
+    # True: bài của nhóm được fan-out vào TimelineEntry, False: nhóm lớn, feed đọc bài của nhóm lúc request
+    # (timeline.py). Lưu lại để mọi request/fan-out dùng cùng 1 quyết định
+    fan_out = models.BooleanField(default=True)
 
     def __str__(self):
         return self.group_name
@@ -46,10 +49,27 @@ class User(AbstractUser):
     posts_comments = models.ManyToManyField('Post', through='Comment', related_name='comments_users')
     posts_likes = models.ManyToManyField('Post', through='Like', related_name='likes_users')
 
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            models.Index(fields=['date_joined'], name='user_date_joined_idx'),
+        ]
+
 
 # many-to-many user and post
 class Comment(Interaction):
     comment = models.TextField()
+    # reply: path = path của comment cha + id của nó (threads.py), depth 0 là comment gốc,
+    # reply_count = số reply đang active mọi cấp bên dưới
+    parent = models.ForeignKey('self', on_delete=models.CASCADE, null=True, blank=True, related_name='replies')
+    path = models.CharField(max_length=255, default='', blank=True)
+    depth = models.PositiveSmallIntegerField(default=0)
+    reply_count = models.IntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['post', 'depth', 'active', 'created_date', 'id'], name='comment_post_root_idx'),
+            models.Index(fields=['post', 'path'], name='comment_thread_idx'),
+        ]
 
     def __str__(self):
         return self.comment
@@ -62,6 +82,11 @@ class Like(Interaction):
 
     class Meta:
         unique_together = [['user', 'post']]  # 1 like với mỗi bài post
+        indexes = [
+            models.Index(fields=['post', 'created_date', 'id'], name='like_post_feed_idx'),
+            # đếm like đang active theo post/loại like (reconcile_counters) chỉ đọc index
+            models.Index(fields=['post', 'active', 'type_of_like'], name='like_post_active_idx'),
+        ]
 
 
 class PostType(models.Model):
@@ -87,11 +112,55 @@ class Post(BaseModel):
                                    related_query_name='users')
     membership = models.ManyToManyField(Membership, related_name='membership_posts', blank=True)
     is_comment = models.BooleanField(default=True, null=True)  # mở/khoá comment
+    # bộ đếm lưu sẵn, cập nhật bằng F() trong counters.py
+    like_count = models.IntegerField(default=0)
+    comment_count = models.IntegerField(default=0)
+
+    class Meta:
+        # index cho phân trang keyset theo (created_date, id)
+        indexes = [
+            models.Index(fields=['active', 'created_date', 'id'], name='post_feed_idx'),
+            models.Index(fields=['created_by', 'active', 'created_date', 'id'], name='post_author_feed_idx'),
+            models.Index(fields=['created_date'], name='post_created_date_idx'),
+        ]
 
     def __str__(self):
         return self.title
 
 
+# số like theo từng LikeType của 1 post
+class PostReaction(models.Model):
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='reactions')
+    type_of_like = models.ForeignKey(LikeType, on_delete=models.CASCADE)
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = [['post', 'type_of_like']]
+
+
+# index tìm kiếm: mỗi dòng là 1 từ (đã bỏ dấu) của title/content của post hoặc của 1 comment
+class SearchToken(models.Model):
+    token = models.CharField(max_length=64)
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='search_tokens')
+    comment = models.ForeignKey(Comment, on_delete=models.CASCADE, null=True, blank=True,
+                                related_name='search_tokens')
+    weight = models.IntegerField(default=1)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['token', 'post'], name='search_token_idx'),
+        ]
+
+
+# timeline dựng sẵn cho mỗi user (fan-out khi post được chia sẻ vào nhóm nhỏ)
+class TimelineEntry(models.Model):
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='timeline_entries')
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='timeline_entries')
+
+    class Meta:
+        unique_together = [['user', 'post']]
+
+
 # Survey
 class Survey(BaseModel):
     title = models.CharField(max_length=100)
@@ -122,8 +191,59 @@ class Answer(models.Model):
         return self.content
 
 
+# mỗi user chỉ chọn 1 answer cho mỗi question
+class Vote(models.Model):
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    question = models.ForeignKey(Question, on_delete=models.CASCADE)
+    answer = models.ForeignKey(Answer, on_delete=models.CASCADE)
+    created_date = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = [['user', 'question']]
+
+
 # kết thúc phần Survey
 
+
+# số post/user mới theo từng ngày, admin thống kê đọc bảng này thay vì GROUP BY cả bảng Post/User
+class DailyStat(models.Model):
+    POSTS = 'posts'
+    USERS = 'users'
+    METRIC_CHOICES = [(POSTS, 'Posts'), (USERS, 'Users')]
+
+    metric = models.CharField(max_length=20, choices=METRIC_CHOICES)
+    day = models.DateField()
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = [['metric', 'day']]
+
+
+# file avatar/cover_photo chờ upload lên Cloudinary (uploads.py), bảng này cũng là hàng đợi cho worker
+class UploadJob(models.Model):
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [(PENDING, 'Pending'), (RUNNING, 'Running'), (DONE, 'Done'), (FAILED, 'Failed')]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='upload_jobs')
+    field = models.CharField(max_length=50)
+    path = models.CharField(max_length=255)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.IntegerField(default=0)
+    last_error = models.TextField(blank=True, default='')
+    created_date = models.DateTimeField(auto_now_add=True)
+    updated_date = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'id'], name='upload_job_status_idx'),
+            # uploads.process kiểm tra job mới hơn của cùng user/field
+            models.Index(fields=['user', 'field', 'id'], name='upload_job_user_idx'),
+        ]
+
+
 # cái phương thức ở dưới để nếu đăng ký admin, thì active=True, còn user thông thường đăng ký thì action=False
 @receiver(pre_save, sender=User)
 def update_is_active(sender, instance, **kwargs):
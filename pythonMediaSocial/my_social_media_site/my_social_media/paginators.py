@@ -1,5 +1,159 @@
-from rest_framework.pagination import PageNumberPagination
+import base64
+import binascii
+import json
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
 
 
-class PostPaginator(PageNumberPagination):
-    page_size = 2
+# phân trang keyset: cursor giữ giá trị các cột sắp xếp của dòng cuối trang trước,
+# trang sau lọc theo (created_date, id) < cursor nên không phải OFFSET qua các dòng đã đọc
+class KeysetPagination(BasePagination):
+    ordering = ('-created_date', '-id')
+    page_size = getattr(settings, 'PAGINATION_PAGE_SIZE', 20)
+    max_page_size = getattr(settings, 'PAGINATION_MAX_PAGE_SIZE', 100)
+    page_size_query_param = 'page_size'
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def get_ordering(self, request, queryset, view=None):
+        if view is not None and hasattr(view, 'get_pagination_ordering'):
+            return view.get_pagination_ordering() or self.ordering
+        return self.ordering
+
+    def _field(self, queryset, name):
+        if name in queryset.query.annotations:
+            return queryset.query.annotations[name].output_field
+        return queryset.model._meta.get_field(name)
+
+    def decode_cursor(self, request, queryset):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            raw = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')).decode('utf-8'))
+            if not isinstance(raw, list) or len(raw) != len(self.current_ordering):
+                raise ValueError
+            return [self._field(queryset, name.lstrip('-')).to_python(value)
+                    for name, value in zip(self.current_ordering, raw)]
+        except (TypeError, ValueError, ValidationError, binascii.Error, UnicodeError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, values):
+        raw = json.dumps(values, cls=DjangoJSONEncoder)
+        return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii')
+
+    # NULL đứng trước mọi giá trị như khi MySQL/SQLite sắp xếp: cột giảm dần thì các dòng NULL (vd. created_date
+    # của post cũ) nằm cuối trang, tăng dần thì nằm đầu. None trong cursor là dòng cuối trang trước có NULL
+    def _after(self, queryset, name, value):
+        field = name.lstrip('-')
+        if not name.startswith('-'):
+            return Q(**{'%s__isnull' % field: False}) if value is None else Q(**{'%s__gt' % field: value})
+        if value is None:
+            return None
+        after = Q(**{'%s__lt' % field: value})
+        if self._field(queryset, field).null:
+            after |= Q(**{'%s__isnull' % field: True})
+        return after
+
+    def _equal(self, name, value):
+        field = name.lstrip('-')
+        return Q(**{'%s__isnull' % field: True}) if value is None else Q(**{field: value})
+
+    def filter_after(self, queryset, values):
+        condition = Q()
+        for i, name in enumerate(self.current_ordering):
+            after = self._after(queryset, name, values[i])
+            if after is None:
+                continue
+            for prev, value in zip(self.current_ordering[:i], values[:i]):
+                after &= self._equal(prev, value)
+            condition |= after
+        return queryset.filter(self._bound(queryset, self.current_ordering[0], values[0]) & condition)
+
+    # điều kiện thừa trên cột đầu (<= / >= cursor) để DB dùng được range scan trên index
+    def _bound(self, queryset, name, value):
+        field = name.lstrip('-')
+        if value is None:
+            return Q(**{'%s__isnull' % field: True}) if name.startswith('-') else Q()
+        if not name.startswith('-'):
+            return Q(**{'%s__gte' % field: value})
+        bound = Q(**{'%s__lte' % field: value})
+        if self._field(queryset, field).null:
+            bound |= Q(**{'%s__isnull' % field: True})
+        return bound
+
+    def _values_of(self, item):
+        if isinstance(item, dict):
+            return [item[name.lstrip('-')] for name in self.current_ordering]
+        return [getattr(item, name.lstrip('-')) for name in self.current_ordering]
+
+    # tách làm 2 bước để view async tự evaluate queryset
+    def get_page_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.current_page_size = self.get_page_size(request)
+        self.current_ordering = tuple(self.get_ordering(request, queryset, view))
+        values = self.decode_cursor(request, queryset)
+        queryset = queryset.order_by(*self.current_ordering)
+        if values is not None:
+            queryset = self.filter_after(queryset, values)
+        return queryset[:self.current_page_size + 1]
+
+    def finish_page(self, rows):
+        rows = list(rows)
+        page = rows[:self.current_page_size]
+        self.next_values = self._values_of(page[-1]) if len(rows) > self.current_page_size else None
+        return page
+
+    def paginate_queryset(self, queryset, request, view=None):
+        return self.finish_page(self.get_page_queryset(queryset, request, view))
+
+    def get_next_link(self):
+        if self.next_values is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.next_values))
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'results': data
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+
+class PostPaginator(KeysetPagination):
+    pass
+
+
+class CommentPaginator(KeysetPagination):
+    pass
+
+
+class LikePaginator(KeysetPagination):
+    pass
+
+
+# reply của 1 comment theo thứ tự thread (materialized path, threads.py)
+class ReplyPaginator(KeysetPagination):
+    ordering = ('path',)
@@ -0,0 +1,250 @@
+import contextlib
+import contextvars
+import logging
+import random
+import threading
+import time
+from bisect import bisect_left
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from rest_framework.serializers import BaseSerializer
+
+logger = logging.getLogger(__name__)
+
+# số đo cho từng view action (PostViewSet.like, UserViewSet.posts, async_views.feed...): thời gian request,
+# số query, thời gian DB, thời gian serialize và kích thước response, gom thành histogram trong bộ nhớ của process
+# (mỗi worker 1 bộ số, Prometheus scrape từng worker và cộng lại)
+BUCKETS = {
+    'latency_seconds': (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+    'db_seconds': (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5),
+    'serializer_seconds': (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5),
+    'queries': (1, 2, 3, 5, 10, 20, 50, 100, 200, 500),
+    'response_bytes': (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304),
+}
+HELP = {
+    'latency_seconds': 'Request time seen by the middleware',
+    'db_seconds': 'Time spent executing SQL',
+    'serializer_seconds': 'Time spent in serializers and fastpath builders',
+    'queries': 'SQL queries per request',
+    'response_bytes': 'Response body size',
+}
+
+current = contextvars.ContextVar('request_profile', default=None)
+_lock = threading.Lock()
+_views = {}
+
+
+def setting(name, default):
+    return getattr(settings, 'PROFILING_%s' % name, default)
+
+
+# số đo của 1 request, nằm trong contextvar nên query chạy trong thread của sync_to_async cũng được tính
+class Profile:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.serializer_seconds = 0.0
+        self.serializing = False
+        self.sql = []
+
+    def add_query(self, sql, seconds):
+        self.queries += 1
+        self.db_seconds += seconds
+        if len(self.sql) < setting('MAX_LOGGED_QUERIES', 200):
+            self.sql.append((sql, seconds))
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    # [(le, số mẫu <= le)], bucket cuối là +Inf
+    def cumulative(self):
+        total = 0
+        result = []
+        for le, count in zip(self.buckets + (float('inf'),), self.counts):
+            total += count
+            result.append((le, total))
+        return result
+
+    # ước lượng percentile bằng cận trên của bucket chứa nó
+    def quantile(self, q):
+        if not self.count:
+            return None
+        for le, total in self.cumulative():
+            if total >= q * self.count:
+                return le
+        return float('inf')
+
+
+def _record_query(execute, sql, params, many, context):
+    profile = current.get()
+    if profile is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        profile.add_query(sql, time.perf_counter() - start)
+
+
+# gắn wrapper vào mọi connection (mỗi thread 1 connection), chỉ 1 lần dù connection mở lại
+def _install_wrapper(sender, connection, **kwargs):
+    if _record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_record_query)
+
+
+# thời gian serialize: chỉ tính lớp ngoài cùng, serializer lồng nhau hay builder gọi builder không bị cộng 2 lần
+@contextlib.contextmanager
+def serializing():
+    profile = current.get()
+    if profile is None or profile.serializing:
+        yield
+        return
+    profile.serializing = True
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        profile.serializer_seconds += time.perf_counter() - start
+        profile.serializing = False
+
+
+def _timed_data(data):
+    def fget(serializer):
+        with serializing():
+            return data.fget(serializer)
+    fget.profiled = True
+    return property(fget)
+
+
+def install():
+    connection_created.connect(_install_wrapper, dispatch_uid='profiling_query_wrapper')
+    # Serializer.data và ListSerializer.data đều gọi BaseSerializer.data của serializer gốc
+    if not getattr(BaseSerializer.data.fget, 'profiled', False):
+        BaseSerializer.data = _timed_data(BaseSerializer.data)
+
+
+# tên action: ViewSet -> 'PostViewSet.like', APIView -> 'XView.get', view hàm -> 'async_views.feed';
+# view ngoài app (admin...) thì không đo
+def view_name(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None or 'admin' in match.app_names:
+        return None
+    func = match.func
+    cls = getattr(func, 'cls', None)
+    if cls is not None:
+        method = request.method.lower()
+        actions = getattr(func, 'actions', None) or {}
+        return '%s.%s' % (cls.__name__, actions.get(method, method))
+    if func.__module__.startswith('my_social_media.'):
+        return '%s.%s' % (func.__module__.rsplit('.', 1)[-1], func.__name__)
+    return None
+
+
+def start():
+    if not setting('ENABLED', True):
+        return None, None
+    profile = Profile()
+    return profile, current.set(profile)
+
+
+def finish(request, response, profile, token):
+    if profile is None:
+        return response
+    current.reset(token)
+    name = view_name(request)
+    if name is None:
+        return response
+
+    values = {
+        'latency_seconds': time.perf_counter() - profile.started,
+        'db_seconds': profile.db_seconds,
+        'serializer_seconds': profile.serializer_seconds,
+        'queries': profile.queries,
+    }
+    if not response.streaming:
+        values['response_bytes'] = len(response.content)
+    with _lock:
+        histograms = _views.setdefault(name, {metric: Histogram(buckets) for metric, buckets in BUCKETS.items()})
+        for metric, value in values.items():
+            histograms[metric].observe(value)
+
+    if is_outlier(values) and random.random() < setting('SAMPLE_RATE', 0.1):
+        log_outlier(request, response, name, values, profile)
+    return response
+
+
+def is_outlier(values):
+    return values['latency_seconds'] * 1000 >= setting('SLOW_MS', 500) \
+        or values['queries'] >= setting('SLOW_QUERIES', 50)
+
+
+def log_outlier(request, response, name, values, profile):
+    lines = ['%8.2f ms  %s' % (seconds * 1000, sql) for sql, seconds in profile.sql]
+    if profile.queries > len(profile.sql):
+        lines.append('... %d more queries' % (profile.queries - len(profile.sql)))
+    logger.warning('slow request %s %s (%s) status=%d %.1f ms, %d queries, db %.1f ms, serializer %.1f ms\n%s',
+                   request.method, request.get_full_path(), name, response.status_code,
+                   values['latency_seconds'] * 1000, values['queries'], values['db_seconds'] * 1000,
+                   values['serializer_seconds'] * 1000, '\n'.join(lines))
+
+
+def reset():
+    with _lock:
+        _views.clear()
+
+
+# bản sao số đo cho trang admin, sắp theo tổng thời gian
+def snapshot():
+    with _lock:
+        views = {name: {metric: (histogram.count, histogram.sum, histogram.cumulative(),
+                                 histogram.quantile(0.5), histogram.quantile(0.95), histogram.quantile(0.99))
+                        for metric, histogram in histograms.items()}
+                 for name, histograms in _views.items()}
+    result = []
+    for name, metrics in views.items():
+        stats = {}
+        for metric, (count, total, buckets, p50, p95, p99) in metrics.items():
+            stats[metric] = {'count': count, 'sum': total, 'avg': total / count if count else None,
+                             'p50': p50, 'p95': p95, 'p99': p99, 'buckets': buckets}
+        result.append({'view': name, 'requests': stats['latency_seconds']['count'], 'metrics': stats})
+    result.sort(key=lambda item: item['metrics']['latency_seconds']['sum'], reverse=True)
+    return result
+
+
+def _label(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"')
+
+
+def _number(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+# text exposition format 0.0.4 của Prometheus
+def prometheus():
+    lines = []
+    views = snapshot()
+    for metric in BUCKETS:
+        name = 'api_request_%s' % metric
+        lines.append('# HELP %s %s' % (name, HELP[metric]))
+        lines.append('# TYPE %s histogram' % name)
+        for item in views:
+            stats = item['metrics'][metric]
+            view = _label(item['view'])
+            for le, count in stats['buckets']:
+                lines.append('%s_bucket{view="%s",le="%s"} %d' % (name, view, _number(le), count))
+            lines.append('%s_sum{view="%s"} %s' % (name, view, _number(stats['sum'])))
+            lines.append('%s_count{view="%s"} %d' % (name, view, stats['count']))
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,54 @@
+import json
+from django.db import connections
+
+# EXPLAIN các queryset nóng của views.py/dao.py (dựng y như lúc chạy thật trong QueryPlanTests, tests.py)
+# và tìm full scan hoặc filesort trong plan
+FULL_SCAN = 'full scan'
+FILESORT = 'filesort'
+
+
+# trang đầu (hoặc trang sau cursor) như KeysetPagination.get_page_queryset
+def page(queryset, paginator_class, after=None):
+    paginator = paginator_class()
+    paginator.current_ordering = tuple(paginator.ordering)
+    queryset = queryset.order_by(*paginator.current_ordering)
+    if after is not None:
+        queryset = paginator.filter_after(queryset, after)
+    return queryset[:paginator.page_size + 1]
+
+
+def _nodes(value):
+    if isinstance(value, dict):
+        yield value
+        for child in value.values():
+            yield from _nodes(child)
+    elif isinstance(value, list):
+        for child in value:
+            yield from _nodes(child)
+
+
+# EXPLAIN FORMAT=JSON của MySQL/MariaDB; bảng dẫn xuất (subquery trong FROM, vd. "qualify" khi lọc theo
+# Window) thì đọc hết là đương nhiên, chỉ xét bảng thật
+def problems(plan):
+    found = []
+    for node in _nodes(json.loads(plan)):
+        table = node.get('table_name', '')
+        derived = table.startswith('<') or 'materialized_from_subquery' in node
+        if node.get('access_type') == 'ALL' and not derived:
+            found.append((FULL_SCAN, table))
+        if node.get('using_filesort') or 'filesort' in node:
+            found.append((FILESORT, table))
+    return found
+
+
+# chỉ có trên MySQL/MariaDB (DB của project), test trong tests.py bỏ qua trên DB khác: SQLite compile
+# filter(active=True) thành "WHERE active" nên không seek được index ghép và plan không phản ánh production.
+# EXPLAIN trên SQL đã compile thay vì QuerySet.explain(): Django 5.0 đặt EXPLAIN vào trong subquery
+# bọc ngoài khi lọc theo Window (reply_preview_queryset) nên câu lệnh sai cú pháp
+def explain(queryset):
+    connection = connections[queryset.db]
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute('EXPLAIN FORMAT=JSON ' + sql, params)
+        plan = cursor.fetchone()[0]
+    return plan, problems(plan)
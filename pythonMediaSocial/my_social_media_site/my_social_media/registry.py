@@ -0,0 +1,43 @@
+import threading
+import time
+from django.conf import settings
+from .models import LikeType, PostType
+
+
+# LikeType/PostType rất ít và hầu như không đổi nên giữ sẵn trong bộ nhớ của process.
+# signals.py xoá cache khi có thay đổi trong process này, process khác tự tải lại sau TTL
+class TypeRegistry:
+    def __init__(self, model):
+        self.model = model
+        self._lock = threading.Lock()
+        self._items = None
+        self._loaded_at = 0.0
+
+    def ttl(self):
+        return getattr(settings, 'TYPE_REGISTRY_TTL', 300)
+
+    def all(self):
+        with self._lock:
+            if self._items is None or time.monotonic() - self._loaded_at > self.ttl():
+                self._items = {obj.pk: obj for obj in self.model.objects.all()}
+                self._loaded_at = time.monotonic()
+            return self._items
+
+    def get(self, pk):
+        try:
+            pk = int(pk)
+        except (TypeError, ValueError):
+            return None
+        return self.all().get(pk)
+
+    # serializer field bị deepcopy khi khởi tạo, registry thì dùng chung
+    def __deepcopy__(self, memo):
+        return self
+
+    def invalidate(self):
+        with self._lock:
+            self._items = None
+
+
+like_types = TypeRegistry(LikeType)
+post_types = TypeRegistry(PostType)
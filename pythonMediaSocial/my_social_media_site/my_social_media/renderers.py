@@ -0,0 +1,29 @@
+from rest_framework.utils.encoders import JSONEncoder
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+_encoder = JSONEncoder()
+
+
+# kiểu orjson không tự xử lý (Decimal, lazy string...) thì dùng encoder của DRF
+def _default(obj):
+    return _encoder.default(obj)
+
+
+def dumps(data):
+    if orjson is None:
+        return FastJSONRenderer().render(data)
+    # escape \u2028/\u2029 giống JSONRenderer của DRF
+    return orjson.dumps(data, default=_default).replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+
+
+# JSONRenderer dùng orjson khi có cài, không thì giữ nguyên json của DRF; ?indent / browsable API vẫn đi đường cũ
+class FastJSONRenderer(JSONRenderer):
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or data is None or self.get_indent(accepted_media_type, renderer_context or {}) is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+        return dumps(data)
@@ -0,0 +1,21 @@
+from django.db.models import F
+from django.utils import timezone
+from .models import DailyStat
+
+
+def to_day(value):
+    if hasattr(value, 'hour') and timezone.is_aware(value):
+        return timezone.localtime(value).date()
+    if hasattr(value, 'date'):
+        return value.date()
+    return value
+
+
+def add(metric, day, delta=1):
+    if day is None:
+        return
+    day = to_day(day)
+    updated = DailyStat.objects.filter(metric=metric, day=day).update(count=F('count') + delta)
+    if not updated:
+        DailyStat.objects.get_or_create(metric=metric, day=day)
+        DailyStat.objects.filter(metric=metric, day=day).update(count=F('count') + delta)
@@ -0,0 +1,76 @@
+import html
+import re
+import unicodedata
+from collections import Counter
+from django.db.models import IntegerField, OuterRef, Q, Subquery, Sum, Value
+from django.utils.html import strip_tags
+from .models import SearchToken
+
+WORD_RE = re.compile(r'\w+')
+MAX_TOKEN_LENGTH = 64
+MAX_QUERY_TERMS = 8
+TITLE_WEIGHT = 3
+CONTENT_WEIGHT = 1
+COMMENT_WEIGHT = 1
+RANKED_ORDERING = ('-search_rank', '-id')
+
+
+# bỏ dấu tiếng Việt: "Đẹp" -> "dep"
+def fold(text):
+    text = text.lower().replace('đ', 'd')
+    return ''.join(c for c in unicodedata.normalize('NFD', text) if unicodedata.category(c) != 'Mn')
+
+
+def tokenize(text):
+    return [token[:MAX_TOKEN_LENGTH] for token in WORD_RE.findall(fold(text or ''))]
+
+
+def html_to_text(value):
+    return html.unescape(strip_tags(value or ''))
+
+
+def token_rows(weighted_texts, post_id, comment_id=None):
+    weights = Counter()
+    for text, weight in weighted_texts:
+        for token in tokenize(text):
+            weights[token] += weight
+    return [SearchToken(token=token, post_id=post_id, comment_id=comment_id, weight=weight)
+            for token, weight in weights.items()]
+
+
+def index_post(post):
+    SearchToken.objects.filter(post=post, comment__isnull=True).delete()
+    if post.active:
+        SearchToken.objects.bulk_create(token_rows([(post.title, TITLE_WEIGHT),
+                                               (html_to_text(post.content), CONTENT_WEIGHT)], post.pk))
+
+
+def index_comments(comments):
+    comments = list(comments)
+    SearchToken.objects.filter(comment__in=[c.pk for c in comments]).delete()
+    rows = []
+    for comment in comments:
+        if comment.active:
+            rows += token_rows([(comment.comment, COMMENT_WEIGHT)], comment.post_id, comment.pk)
+    SearchToken.objects.bulk_create(rows, batch_size=1000)
+
+
+def index_comment(comment):
+    index_comments([comment])
+
+
+# lọc post có đủ mọi từ trong q (khớp tiền tố), rank = tổng weight các từ khớp
+def search_posts(queryset, q):
+    terms = list(dict.fromkeys(tokenize(q)))[:MAX_QUERY_TERMS]
+    if not terms:
+        return queryset.annotate(search_rank=Value(0, output_field=IntegerField())).none()
+
+    # token và term đều đã qua tokenize (bỏ dấu, chữ thường) nên so tiền tố thường, dùng được search_token_idx
+    term_filter = Q()
+    for term in terms:
+        queryset = queryset.filter(pk__in=SearchToken.objects.filter(token__startswith=term).values('post_id'))
+        term_filter |= Q(token__startswith=term)
+
+    rank = SearchToken.objects.filter(term_filter, post=OuterRef('pk')).order_by() \
+        .values('post').annotate(total=Sum('weight')).values('total')
+    return queryset.annotate(search_rank=Subquery(rank, output_field=IntegerField()))
@@ -1,26 +1,45 @@
+from django.core.files.uploadedfile import UploadedFile
+from django.db import models
+from django.db.models import OuterRef, Subquery
 from rest_framework import serializers
 from rest_framework.fields import SerializerMethodField
 from rest_framework.serializers import ModelSerializer
-from .models import LikeType, Post, User, Comment, Like, Survey, Answer, Question
+from .models import LikeType, PostType, Post, User, Comment, Like, Survey, Answer, Question
+from .registry import like_types, post_types
+from . import loaders, media, uploads
 
 
-class UserSerializer(ModelSerializer):
-    avatar_url = serializers.SerializerMethodField()
-    cover_photo_url = serializers.SerializerMethodField()
-
-    def get_avatar_url(self, obj):
-        if obj.avatar:
-            avatar_url = obj.avatar.url
-            return avatar_url
-        else:
-            return None
+# serializer khai báo các quan hệ nó đọc, viewset dùng setup_eager_loading để tránh N+1 query
+class EagerLoadingMixin:
+    select_related_fields = []
+    prefetch_related_fields = []
 
-    def get_cover_photo_url(self, obj):
-        if obj.cover_photo:
-            cover_photo_url = obj.cover_photo.url
-            return cover_photo_url
-        else:
-            return None
+    @classmethod
+    def annotate_queryset(cls, queryset, request=None):
+        return queryset
+
+    @classmethod
+    def setup_eager_loading(cls, queryset, request=None):
+        if cls.select_related_fields:
+            queryset = queryset.select_related(*cls.select_related_fields)
+        if cls.prefetch_related_fields:
+            queryset = queryset.prefetch_related(*cls.prefetch_related_fields)
+        return cls.annotate_queryset(queryset, request)
+
+
+# URL ảnh Cloudinary (variant trong media.py), lấy từ cache URL thay vì build lại cho từng dòng
+class ImageUrlField(serializers.ReadOnlyField):
+    def __init__(self, variant=None, **kwargs):
+        self.variant = variant
+        super().__init__(**kwargs)
+
+    def to_representation(self, value):
+        return media.image_url(value, self.variant)
+
+
+class UserSerializer(ModelSerializer):
+    avatar_url = ImageUrlField(source='avatar')
+    cover_photo_url = ImageUrlField(source='cover_photo')
 
     class Meta:
         model = User
@@ -40,60 +59,86 @@ class UserSerializer(ModelSerializer):
         return user
 
 
+# khoá ngoại tới LikeType/PostType, kiểm tra bằng registry thay vì query DB
+class RegistryPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    def __init__(self, registry, **kwargs):
+        self.registry = registry
+        kwargs.setdefault('queryset', registry.model.objects.all())
+        super().__init__(**kwargs)
+
+    def to_internal_value(self, data):
+        obj = self.registry.get(data)
+        if obj is None:
+            self.fail('does_not_exist', pk_value=data)
+        return obj
+
+
 class LikeTypeSerializer(ModelSerializer):
     class Meta:
         model = LikeType
         fields = ['id', 'name_type']
 
 
-class LikeSerializer(ModelSerializer):
-    type_of_like = LikeTypeSerializer()
+class PostTypeSerializer(ModelSerializer):
+    class Meta:
+        model = PostType
+        fields = ['id', 'name_type']
+
+
+class LikeSerializer(EagerLoadingMixin, ModelSerializer):
+    type_of_like = serializers.SerializerMethodField()
+
+    def get_type_of_like(self, like):
+        like_type = like_types.get(like.type_of_like_id)
+        return LikeTypeSerializer(like_type).data if like_type else None
 
     class Meta:
         model = Like
         fields = ['user', 'type_of_like', 'post', 'active']
 
 
-class UserInPostSerializer(ModelSerializer):
-    avatar_url = serializers.SerializerMethodField()
+# thông tin rút gọn của user khi xuất hiện trong post, comment, survey...; avatar_thumb_url là ảnh nhỏ cho feed
+class UserSummarySerializer(ModelSerializer):
+    avatar_url = ImageUrlField(source='avatar')
+    avatar_thumb_url = ImageUrlField(source='avatar', variant='thumb')
 
     class Meta:
         model = User
-        fields = ['id', 'first_name', 'last_name', 'avatar_url']
+        fields = ['id', 'first_name', 'last_name', 'avatar_url', 'avatar_thumb_url']
 
-    def get_avatar_url(self, obj):
-        if obj.avatar:
-            avatar_url = obj.avatar.url
-            return avatar_url
-        else:
-            return None
 
+# user rút gọn lấy qua loader của request (loaders.py) từ id, source là cột khoá ngoại (vd. created_by_id)
+class UserSummaryField(serializers.Field):
+    def __init__(self, **kwargs):
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
 
-class UserProfileSerializer(ModelSerializer):
-    avatar_url = serializers.SerializerMethodField()
-    cover_photo_url = serializers.SerializerMethodField()
+    def to_representation(self, user_id):
+        return loaders.get_loader(self.context).get(user_id)
 
-    class Meta:
-        model = User
-        fields = ['id', 'first_name', 'last_name', 'avatar_url', 'cover_photo_url']
 
-    def get_avatar_url(self, obj):
-        if obj.avatar:
-            avatar_url = obj.avatar.url
-            return avatar_url
-        else:
-            return None
+# many=True: nạp user của cả trang bằng 1 query trước khi serialize từng dòng
+class UserPrimingListSerializer(serializers.ListSerializer):
+    def to_representation(self, data):
+        iterable = data.all() if isinstance(data, models.manager.BaseManager) else data
+        loaders.prime(self.child, iterable)
+        return super().to_representation(iterable)
 
-    def get_cover_photo_url(self, obj):
-        if obj.cover_photo:
-            cover_photo_url = obj.cover_photo.url
-            return cover_photo_url
-        else:
-            return None
+
+class UserProfileSerializer(UserSummarySerializer):
+    avatar_profile_url = ImageUrlField(source='avatar', variant='profile')
+    cover_photo_url = ImageUrlField(source='cover_photo')
+    cover_photo_profile_url = ImageUrlField(source='cover_photo', variant='cover')
+
+    class Meta:
+        model = User
+        fields = ['id', 'first_name', 'last_name', 'avatar_url', 'avatar_profile_url', 'cover_photo_url',
+                  'cover_photo_profile_url']
 
 
-class PostSerializer(ModelSerializer):
-    # created_by = UserInPostSerializer()
+class PostSerializer(EagerLoadingMixin, ModelSerializer):
+    type_of_post = RegistryPrimaryKeyRelatedField(post_types)
+    # created_by = UserSummarySerializer()
 
     # posts_likes = LikeSerializer(source='post_likes', many=True)
 
@@ -107,13 +152,15 @@ class PostSerializer(ModelSerializer):
         return Post.objects.create(**validated_data)
 
 
-class CommentSerializer(ModelSerializer):
-    user = UserInPostSerializer()
+class CommentSerializer(EagerLoadingMixin, ModelSerializer):
+    user = UserSummaryField(source='user_id')
 
     class Meta:
         model = Comment
-        fields = ['id', 'comment', 'user', 'created_date', 'updated_date']
+        fields = ['id', 'comment', 'user', 'parent', 'depth', 'reply_count', 'active', 'created_date', 'updated_date']
+        read_only_fields = ['parent', 'depth', 'reply_count']
         ordering = ['-id']
+        list_serializer_class = UserPrimingListSerializer
 
 
 class CommentCreateSerializer(ModelSerializer):
@@ -122,15 +169,54 @@ class CommentCreateSerializer(ModelSerializer):
         fields = ['comment']
 
 
+# 1 thao tác trong /posts/batch/
+class BatchOperationSerializer(serializers.Serializer):
+    op = serializers.ChoiceField(choices=['like', 'unlike', 'comment'])
+    post = serializers.IntegerField()
+    type_of_like = RegistryPrimaryKeyRelatedField(like_types, required=False)
+    comment = serializers.CharField(required=False)
+
+    def validate(self, attrs):
+        if attrs['op'] == 'like' and 'type_of_like' not in attrs:
+            raise serializers.ValidationError({'type_of_like': 'type_of_like is required.'})
+        if attrs['op'] == 'comment' and not attrs.get('comment'):
+            raise serializers.ValidationError({'comment': 'comment is required.'})
+        return attrs
+
+
 class PostDetailsSerializer(PostSerializer):
     liked = serializers.SerializerMethodField()
-    created_by = UserInPostSerializer()
+    liked_type = serializers.SerializerMethodField()
+    reactions = serializers.SerializerMethodField()
+    created_by = UserSummaryField(source='created_by_id')
+    prefetch_related_fields = ['reactions']
+
+    # loại like của người đang xem, lấy bằng 1 subquery cho cả trang thay vì query từng post
+    @classmethod
+    def annotate_queryset(cls, queryset, request=None):
+        if request is None or not request.user.is_authenticated:
+            return queryset
+        viewer_likes = Like.objects.filter(post=OuterRef('pk'), user=request.user, active=True)
+        return queryset.annotate(viewer_like_type=Subquery(viewer_likes.values('type_of_like')[:1]))
+
+    def viewer_like_type(self, post):
+        request = self.context.get('request')
+        if request is None or not request.user.is_authenticated:
+            return None
+        if hasattr(post, 'viewer_like_type'):
+            return post.viewer_like_type
+        like = post.like_set.filter(user=request.user, active=True).first()
+        return like.type_of_like_id if like else None
 
     def get_liked(self, post):
-        request = self.context.get('request')
-        if request.user.is_authenticated:
-            return post.like_set.filter(active=True).exists()
-        return False
+        return self.viewer_like_type(post) is not None
+
+    def get_liked_type(self, post):
+        return self.viewer_like_type(post)
+
+    def get_reactions(self, post):
+        return [{'type_of_like': r.type_of_like_id, 'count': r.count}
+                for r in post.reactions.all() if r.count > 0]
 
     # def create(self, validated_data):
     #     user = self.context['request'].user
@@ -139,17 +225,21 @@ class PostDetailsSerializer(PostSerializer):
 
     class Meta:
         model = Post
-        fields = PostSerializer.Meta.fields + ['liked'] + ['created_by']
+        fields = PostSerializer.Meta.fields + ['liked', 'liked_type'] + ['created_by'] + \
+            ['like_count', 'comment_count', 'reactions']
+        read_only_fields = ['like_count', 'comment_count']
+        list_serializer_class = UserPrimingListSerializer
 
 
 # Dưới đây là cho chức năng Survey
 
-class SurveySerializer(ModelSerializer):
-    created_by = UserInPostSerializer()
+class SurveySerializer(EagerLoadingMixin, ModelSerializer):
+    created_by = UserSummaryField(source='created_by_id')
 
     class Meta:
         model = Survey
         fields = ['id', 'title', 'description', 'created_date', 'updated_date', 'active', 'created_by']
+        list_serializer_class = UserPrimingListSerializer
 
 
 class QuestionSerializer(ModelSerializer):
@@ -164,20 +254,57 @@ class AnswerSerializer(ModelSerializer):
         fields = '__all__'
 
 
+class AnswerInSurveySerializer(ModelSerializer):
+    class Meta:
+        model = Answer
+        fields = ['id', 'content', 'quantity']
+
+
+class QuestionDetailsSerializer(ModelSerializer):
+    answers = AnswerInSurveySerializer(source='answer_set', many=True)
+    total_votes = serializers.SerializerMethodField()
+
+    def get_total_votes(self, question):
+        return sum(answer.quantity for answer in question.answer_set.all())
+
+    class Meta:
+        model = Question
+        fields = ['id', 'content', 'total_votes', 'answers']
+
+
+# survey kèm question và answer, lấy hết bằng prefetch
+class SurveyDetailsSerializer(SurveySerializer):
+    questions = QuestionDetailsSerializer(source='question_set', many=True)
+    prefetch_related_fields = ['question_set__answer_set']
+
+    class Meta:
+        model = Survey
+        fields = SurveySerializer.Meta.fields + ['questions']
+
+
 class UserRegisterSerializer(ModelSerializer):
+    # các field ảnh đang chờ upload nền (uploads.py), avatar/cover_photo sẽ có giá trị khi upload xong
+    pending_uploads = serializers.SerializerMethodField()
+
     class Meta:
         model = User
         fields = ['id', 'first_name', 'last_name', 'username', 'email', 'date_of_birth', 'number_phone', 'avatar',
-                  'cover_photo', 'password']
+                  'cover_photo', 'password', 'pending_uploads']
         extra_kwargs = {
             'password': {
                 'write_only': True
             }
         }
 
+    def get_pending_uploads(self, user):
+        return getattr(user, 'pending_uploads', [])
+
     def create(self, validated_data):
+        files = {field: validated_data.pop(field) for field in uploads.UPLOAD_FIELDS
+                 if isinstance(validated_data.get(field), UploadedFile)}
         user = User(**validated_data)
         user.set_password(validated_data['password'])
         user.save()
+        user.pending_uploads = [uploads.schedule(user, field, f).field for field, f in files.items()]
 
         return user
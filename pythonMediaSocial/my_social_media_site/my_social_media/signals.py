@@ -0,0 +1,146 @@
+from django.db.models.signals import post_save, post_delete, m2m_changed
+from django.db import transaction
+from django.dispatch import receiver
+from .models import Post, User, Comment, Survey, Question, Answer, LikeType, PostType, DailyStat
+from . import timeline, search, surveys, caching, registry, rollups, threads
+
+
+def _affected_pks(instance, action, pk_set, related_manager):
+    # clear() không gửi pk_set, nên ghi lại các dòng liên quan ở pre_clear
+    if action == 'pre_clear':
+        instance._timeline_cleared = list(related_manager.values_list('pk', flat=True))
+        return None
+    if action == 'post_clear':
+        return getattr(instance, '_timeline_cleared', [])
+    return pk_set or []
+
+
+@receiver(post_save, sender=Post)
+def post_created_fan_out(sender, instance, created, **kwargs):
+    if created:
+        timeline.fan_out_post(instance, membership_ids=[])
+
+
+# xoá post/comment thì SearchToken bị xoá theo (CASCADE)
+@receiver(post_save, sender=Post)
+def post_saved_index(sender, instance, **kwargs):
+    search.index_post(instance)
+
+
+# comment mới (cả comment tạo trong admin) được gán path theo comment cha
+@receiver(post_save, sender=Comment)
+def comment_created_path(sender, instance, created, **kwargs):
+    if created and not instance.path:
+        threads.assign_path(instance)
+
+
+@receiver(post_save, sender=Comment)
+def comment_saved_index(sender, instance, **kwargs):
+    search.index_comment(instance)
+
+
+@receiver(m2m_changed, sender=Post.membership.through)
+def post_membership_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'pre_clear', 'post_clear'):
+        return
+    if not reverse:
+        if action == 'post_add':
+            timeline.fan_out_post(instance, membership_ids=pk_set)
+        elif action != 'pre_clear':
+            timeline.rebuild_post(instance)
+        return
+
+    # instance là Membership, pk_set là id các post
+    post_ids = _affected_pks(instance, action, pk_set, instance.membership_posts)
+    if post_ids is None:
+        return
+    for post in Post.objects.filter(pk__in=post_ids):
+        if action == 'post_add':
+            timeline.fan_out_post(post, membership_ids=[instance.pk])
+        else:
+            timeline.rebuild_post(post)
+
+
+@receiver(m2m_changed, sender=User.membership.through)
+def user_membership_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'pre_clear', 'post_clear'):
+        return
+    if action == 'post_add':
+        timeline.update_fan_out(pk_set if not reverse else [instance.pk])
+    if not reverse:
+        if action == 'post_add':
+            timeline.backfill_user(instance, pk_set)
+        elif action != 'pre_clear':
+            timeline.prune_user(instance)
+        return
+
+    # instance là Membership, pk_set là id các user
+    user_ids = _affected_pks(instance, action, pk_set, instance.users)
+    if user_ids is None:
+        return
+    for user in User.objects.filter(pk__in=user_ids):
+        if action == 'post_add':
+            timeline.backfill_user(user, [instance.pk])
+        else:
+            timeline.prune_user(user)
+
+
+# response cache (caching.py) phụ thuộc version của model và của từng object
+@receiver([post_save, post_delete], sender=Post)
+@receiver([post_save, post_delete], sender=User)
+@receiver([post_save, post_delete], sender=Survey)
+@receiver([post_save, post_delete], sender=LikeType)
+@receiver([post_save, post_delete], sender=PostType)
+def bump_cache_namespaces(sender, instance, **kwargs):
+    namespaces = [caching.model_namespace(sender), caching.model_namespace(sender, instance.pk)]
+
+    def bump():
+        for namespace in namespaces:
+            caching.bump_namespace(namespace)
+    transaction.on_commit(bump)
+
+
+# payload /surveys/{id}/full/ được cache theo version của survey, question/answer đổi thì đổi version survey
+@receiver([post_save, post_delete], sender=Question)
+def question_changed(sender, instance, **kwargs):
+    surveys.bump_survey_version_on_commit(instance.survey_id)
+
+
+@receiver([post_save, post_delete], sender=Answer)
+def answer_changed(sender, instance, **kwargs):
+    survey_id = Question.objects.filter(pk=instance.questions_id).values_list('survey_id', flat=True).first()
+    if survey_id is not None:
+        surveys.bump_survey_version_on_commit(survey_id)
+
+
+@receiver([post_save, post_delete], sender=LikeType)
+def like_type_changed(sender, **kwargs):
+    registry.like_types.invalidate()
+
+
+@receiver([post_save, post_delete], sender=PostType)
+def post_type_changed(sender, **kwargs):
+    registry.post_types.invalidate()
+
+
+# bảng DailyStat cho trang thống kê của admin
+@receiver(post_save, sender=Post)
+def post_created_stat(sender, instance, created, **kwargs):
+    if created:
+        rollups.add(DailyStat.POSTS, instance.created_date)
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted_stat(sender, instance, **kwargs):
+    rollups.add(DailyStat.POSTS, instance.created_date, -1)
+
+
+@receiver(post_save, sender=User)
+def user_created_stat(sender, instance, created, **kwargs):
+    if created:
+        rollups.add(DailyStat.USERS, instance.date_joined)
+
+
+@receiver(post_delete, sender=User)
+def user_deleted_stat(sender, instance, **kwargs):
+    rollups.add(DailyStat.USERS, instance.date_joined, -1)
@@ -0,0 +1,47 @@
+from django.db import transaction
+from django.db.models import F
+from .models import Answer, Survey, Vote
+from . import caching
+
+FULL_PAYLOAD_TIMEOUT = 60 * 60
+
+
+# version đổi mỗi khi survey/question/answer thay đổi, payload cũ nằm dưới key cũ và tự hết hạn
+def survey_version(survey_id):
+    return caching.namespace_version(caching.model_namespace(Survey, survey_id))
+
+
+def bump_survey_version_on_commit(survey_id):
+    namespace = caching.model_namespace(Survey, survey_id)
+    transaction.on_commit(lambda: caching.bump_namespace(namespace))
+
+
+def full_etag(survey_id, version):
+    return '"survey-%s-%s"' % (survey_id, version)
+
+
+def get_full_payload(survey_id, version, build):
+    key = 'survey_full:%s:%s' % (survey_id, version)
+    return caching.get_or_compute('survey_full', key, build,
+                                  caching.policy_timeout('survey_full', FULL_PAYLOAD_TIMEOUT))
+
+
+# ghi phiếu của user cho 1 answer; chọn lại answer khác trong cùng question thì chuyển phiếu.
+# quantity chỉ tăng/giảm bằng F() nên không mất phiếu khi nhiều request cùng lúc; vote được khoá để 2 request đổi
+# phiếu cùng lúc của 1 user không cùng trừ answer cũ
+@transaction.atomic
+def cast_vote(user, answer):
+    vote, created = Vote.objects.select_for_update().get_or_create(user=user, question_id=answer.questions_id,
+                                                                   defaults={'answer': answer})
+    if created:
+        Answer.objects.filter(pk=answer.pk).update(quantity=F('quantity') + 1)
+    elif vote.answer_id != answer.pk:
+        old_answer_id = vote.answer_id
+        vote.answer = answer
+        vote.save(update_fields=['answer'])
+        Answer.objects.filter(pk=old_answer_id).update(quantity=F('quantity') - 1)
+        Answer.objects.filter(pk=answer.pk).update(quantity=F('quantity') + 1)
+    else:
+        return vote
+    bump_survey_version_on_commit(answer.questions.survey_id)
+    return vote
@@ -1,3 +1,550 @@
-from django.test import TestCase
+import json
+import os
+import tempfile
+from datetime import date, timedelta
+from io import StringIO
+from types import SimpleNamespace
+from unittest import mock, skipUnless
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import Count
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+from .models import (Answer, Comment, DailyStat, Like, LikeType, Membership, Post, PostReaction, PostType, Question,
+                     SearchToken, Survey, TimelineEntry, UploadJob, User)
+from .paginators import CommentPaginator, LikePaginator, PostPaginator, ReplyPaginator
+from .serializers import PostDetailsSerializer
+from . import counters, dao, fastpath, interactions, queryplans, search, surveys, threads, timeline, uploads
 
-# Create your tests here.
+
+# số query của các trang danh sách không được tăng theo số dòng trên trang (không có N+1)
+class ListQueryCountTests(TestCase):
+    SMALL, LARGE = 2, 10
+
+    @classmethod
+    def setUpTestData(cls):
+        post_type = PostType.objects.create(name_type='post')
+        cls.like_type = LikeType.objects.create(name_type='like')
+        group = Membership.objects.create(group_name='group')
+        cls.users = [User.objects.create(username='user%d' % i, is_active=True) for i in range(cls.LARGE + 1)]
+        for user in cls.users:
+            user.membership.add(group)
+        cls.post = Post.objects.create(title='post', content='content', type_of_post=post_type,
+                                       created_by=cls.users[0])
+        for i, user in enumerate(cls.users):
+            post = Post.objects.create(title='post %d' % i, content='content', type_of_post=post_type,
+                                       created_by=user)
+            post.membership.add(group)
+            Like.objects.create(user=user, post=cls.post, type_of_like=cls.like_type)
+            Comment.objects.create(user=user, post=cls.post, comment='comment %d' % i)
+            survey = Survey.objects.create(title='survey %d' % i, description='description', created_by=user)
+            question = Question.objects.create(content='question', survey=survey)
+            Answer.objects.create(content='answer', questions=question)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.users[0])
+
+    # chạy 1 lần trước để nạp registry LikeType/PostType trong bộ nhớ, sau đó 2 kích thước trang
+    # phải cùng số query
+    def assertConstantQueries(self, url, num):
+        self.client.get(url, {'page_size': 1})
+        for size in (self.SMALL, self.LARGE):
+            cache.clear()
+            with self.assertNumQueries(num):
+                response = self.client.get(url, {'page_size': size})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(len(response.data['results']), size)
+
+    def test_post_list(self):
+        self.assertConstantQueries('/posts/', 3)
+
+    def test_comment_list(self):
+        self.assertConstantQueries('/posts/%d/comments/' % self.post.pk, 4)
+
+    def test_like_list(self):
+        self.assertConstantQueries('/posts/%d/likes/' % self.post.pk, 2)
+
+    # danh sách survey không phân trang: so sánh khi chỉ còn SMALL survey
+    def test_survey_list(self):
+        self.client.get('/surveys/')
+        for size in (self.LARGE, self.SMALL):
+            Survey.objects.filter(pk__in=Survey.objects.order_by('-id').values('pk')[size:]).delete()
+            cache.clear()
+            with self.assertNumQueries(2):
+                response = self.client.get('/surveys/')
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(len(response.data), size)
+
+
+class CommentCounterTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username='author', is_active=True)
+        self.post = Post.objects.create(title='post', content='content', created_by=self.user,
+                                        type_of_post=PostType.objects.create(name_type='post'))
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        response = self.client.post('/posts/%d/add_comment/' % self.post.pk, {'comment': 'hi'}, format='json')
+        self.comment_id = response.data['id']
+
+    def comment_count(self):
+        self.post.refresh_from_db(fields=['comment_count'])
+        return self.post.comment_count
+
+    def test_patch_active_updates_comment_count(self):
+        self.assertEqual(self.comment_count(), 1)
+        url = '/comments/%d/' % self.comment_id
+        self.client.patch(url, {'active': False}, format='json')
+        self.assertEqual(self.comment_count(), 0)
+        self.client.patch(url, {'active': False}, format='json')
+        self.assertEqual(self.comment_count(), 0)
+        self.client.patch(url, {'active': True}, format='json')
+        self.assertEqual(self.comment_count(), 1)
+
+
+class KeysetPaginationTests(TestCase):
+    def test_pages_through_posts_without_created_date(self):
+        user = User.objects.create(username='author', is_active=True)
+        post_type = PostType.objects.create(name_type='post')
+        posts = [Post.objects.create(title='post %d' % i, content='content', type_of_post=post_type,
+                                     created_by=user) for i in range(5)]
+        Post.objects.filter(pk__in=[posts[1].pk, posts[3].pk, posts[4].pk]).update(created_date=None)
+
+        client = APIClient()
+        seen = []
+        url = '/posts/?page_size=2'
+        while url:
+            response = client.get(url)
+            self.assertEqual(response.status_code, 200)
+            seen += [item['id'] for item in response.data['results']]
+            url = response.data['next']
+        self.assertEqual(seen, [posts[2].pk, posts[0].pk, posts[4].pk, posts[3].pk, posts[1].pk])
+
+
+@override_settings(TIMELINE_FANOUT_MAX_GROUP_SIZE=2)
+class TimelineFanOutTests(TestCase):
+    def setUp(self):
+        self.group = Membership.objects.create(group_name='group')
+        self.post_type = PostType.objects.create(name_type='post')
+        self.users = [User.objects.create(username='user%d' % i, is_active=True) for i in range(3)]
+
+    def feed_ids(self, user):
+        return set(timeline.feed_queryset(user).values_list('pk', flat=True))
+
+    def publish(self, author):
+        post = Post.objects.create(title='post', content='content', type_of_post=self.post_type, created_by=author)
+        post.membership.add(self.group)
+        return post
+
+    # bài đăng lúc nhóm còn fan-out vẫn có trong feed sau khi nhóm thành nhóm lớn, và ngược lại
+    def test_group_growing_past_limit_switches_to_read_time(self):
+        self.group.users.add(self.users[0], self.users[1])
+        early = self.publish(self.users[0])
+        self.group.users.add(self.users[2])
+        self.group.refresh_from_db()
+        self.assertFalse(self.group.fan_out)
+        late = self.publish(self.users[0])
+
+        self.assertEqual(self.feed_ids(self.users[1]), {early.pk, late.pk})
+        self.assertEqual(self.feed_ids(self.users[2]), {early.pk, late.pk})
+        self.assertEqual(timeline.feed_queryset(self.users[1]).count(), 2)
+
+    def test_rebuild_switches_shrunk_group_back_to_fan_out(self):
+        self.group.users.add(*self.users)
+        post = self.publish(self.users[0])
+        self.group.users.remove(self.users[2])
+        call_command('rebuild_timelines', stdout=StringIO())
+        self.group.refresh_from_db()
+        self.assertTrue(self.group.fan_out)
+        self.assertEqual(self.feed_ids(self.users[1]), {post.pk})
+        self.assertEqual(self.feed_ids(self.users[2]), set())
+
+
+class SurveyFullTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        user = User.objects.create(username='author', is_active=True)
+        self.survey = Survey.objects.create(title='survey', description='description', created_by=user)
+        self.client = APIClient()
+
+    def test_if_none_match(self):
+        url = '/surveys/%d/full/' % self.survey.pk
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH='*').status_code, 304)
+
+    def test_wildcard_does_not_match_missing_survey(self):
+        url = '/surveys/%d/full/' % (self.survey.pk + 1)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH='*').status_code, 404)
+
+    # đổi phiếu qua lại, quantity luôn khớp số Vote của từng answer
+    def test_change_vote(self):
+        user = User.objects.create(username='voter', is_active=True)
+        question = Question.objects.create(content='question', survey=self.survey)
+        first, second = [Answer.objects.create(content=content, questions=question) for content in ('a', 'b')]
+        for answer in (first, second, second, first, second):
+            surveys.cast_vote(user, answer)
+        for answer in Answer.objects.annotate(votes=Count('vote')):
+            self.assertEqual(answer.quantity, answer.votes)
+        self.assertEqual(Answer.objects.get(pk=second.pk).quantity, 1)
+
+
+class ResponseCacheTests(TestCase):
+    # endpoint không phụ thuộc user đang xem: user thứ 2 đọc lại entry của user đầu tiên
+    def test_shared_between_viewers(self):
+        cache.clear()
+        LikeType.objects.create(name_type='like')
+        client = APIClient()
+        for i in range(2):
+            client.force_authenticate(User.objects.create(username='viewer%d' % i, is_active=True))
+            with self.assertNumQueries(1 - i):
+                self.assertEqual(len(client.get('/liketypes/').data), 1)
+
+
+class BatchCommentTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username='author', is_active=True)
+        post_type = PostType.objects.create(name_type='post')
+        self.posts = [Post.objects.create(title='post', content='content', type_of_post=post_type,
+                                          created_by=self.user) for _ in range(2)]
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def post_batch(self):
+        # comment khác của cùng user ghi sau cùng, không được lẫn vào id của batch
+        Comment.objects.create(user=self.user, post=self.posts[0], comment='other')
+        operations = [{'op': 'comment', 'post': post.pk, 'comment': 'batch %d' % i}
+                      for i, post in enumerate(self.posts * 2)]
+        response = self.client.post('/posts/batch/', {'operations': operations}, format='json')
+        self.assertEqual(response.status_code, 200)
+        for i, result in enumerate(response.data['results']):
+            comment = Comment.objects.get(pk=result['comment'])
+            self.assertEqual(comment.comment, 'batch %d' % i)
+            self.assertEqual(comment.path, threads.segment(comment.pk))
+
+    def test_comment_ids(self):
+        self.post_batch()
+
+    # như MySQL: bulk_create không trả id
+    def test_comment_ids_without_returning_rows(self):
+        with mock.patch.object(type(connection.features), 'can_return_rows_from_bulk_insert', False):
+            self.post_batch()
+
+
+class LikeTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username='author', is_active=True)
+        self.post = Post.objects.create(title='post', content='content', created_by=self.user,
+                                        type_of_post=PostType.objects.create(name_type='post'))
+        self.like, self.love = LikeType.objects.create(name_type='like'), LikeType.objects.create(name_type='love')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def url(self, action):
+        return '/posts/%d/%s/' % (self.post.pk, action)
+
+    def test_like_unlike_update(self):
+        response = self.client.post(self.url('like'), {'type_of_like': self.like.pk}, format='json')
+        self.assertEqual((response.status_code, response.data['liked'], response.data['like_count']), (200, True, 1))
+        response = self.client.patch(self.url('update_like'), {'type_of_like': self.love.pk}, format='json')
+        self.assertEqual(response.data['reactions'], [{'type_of_like': self.love.pk, 'count': 1}])
+        response = self.client.patch(self.url('unlike'))
+        self.assertEqual((response.data['liked'], response.data['like_count']), (False, 0))
+        response = self.client.post(self.url('like'), {'type_of_like': self.like.pk}, format='json')
+        self.assertEqual((response.data['liked'], response.data['like_count']), (True, 1))
+
+    def test_missing_like(self):
+        self.assertEqual(self.client.patch(self.url('unlike')).status_code, 404)
+
+    # request khác ghi like đầu tiên giữa lúc đọc và lúc INSERT: chỉ cộng bộ đếm 1 lần
+    def test_concurrent_first_like(self):
+        Like.objects.create(user=self.user, post=self.post, type_of_like=self.like)
+        counters.like_added(self.post.pk, self.like.pk)
+        locked = interactions._locked_like
+        with mock.patch.object(interactions, '_locked_like', side_effect=[None, locked(self.user, self.post.pk)]):
+            like = interactions.set_like(self.user, self.post.pk, self.love, active=True)
+        self.assertTrue(like.active)
+        self.post.refresh_from_db(fields=['like_count'])
+        self.assertEqual(self.post.like_count, 1)
+        self.assertEqual(Like.objects.get(user=self.user, post=self.post).type_of_like_id, self.love.pk)
+
+
+class UploadScheduleTests(TestCase):
+    def test_pending_file_is_stored_outside_media_root(self):
+        user = User.objects.create(username='author', is_active=True)
+        with tempfile.TemporaryDirectory() as root, override_settings(UPLOAD_TEMP_ROOT=root), \
+                mock.patch.object(uploads, 'get_executor') as get_executor:
+            with self.captureOnCommitCallbacks(execute=True):
+                job = uploads.schedule(user, 'avatar', SimpleUploadedFile('a.png', b'png'))
+            self.assertTrue(os.path.exists(os.path.join(root, job.path)))
+            self.assertFalse(os.path.exists(os.path.join(settings.MEDIA_ROOT, job.path)))
+            self.assertEqual(job.status, UploadJob.PENDING)
+            get_executor.assert_not_called()
+
+    # job chờ lâu trong hàng đợi không bị worker khác đưa về pending ngay khi vừa được nhận
+    def test_claimed_job_survives_stale_reset(self):
+        user = User.objects.create(username='author', is_active=True)
+        job = UploadJob.objects.create(user=user, field='avatar', path='avatar/a.png')
+        UploadJob.objects.filter(pk=job.pk).update(updated_date=timezone.now() - timedelta(hours=2))
+
+        def upload(job):
+            if upload_mock.call_count == 1:
+                call_command('process_uploads', stdout=StringIO())
+            return 'avatar/a'
+
+        with tempfile.TemporaryDirectory() as root, override_settings(UPLOAD_TEMP_ROOT=root), \
+                mock.patch.object(uploads, 'upload', side_effect=upload) as upload_mock:
+            self.assertEqual(uploads.process(job.pk).status, UploadJob.DONE)
+        self.assertEqual(upload_mock.call_count, 1)
+
+
+class LikeListShapeTests(TestCase):
+    # /posts/{id}/likes/ trả user là id (API công khai từ trước)
+    def test_user_is_id(self):
+        user = User.objects.create(username='author', is_active=True)
+        post = Post.objects.create(title='post', content='content', created_by=user,
+                                   type_of_post=PostType.objects.create(name_type='post'))
+        like_type = LikeType.objects.create(name_type='like')
+        Like.objects.create(user=user, post=post, type_of_like=like_type)
+        response = APIClient().get('/posts/%d/likes/' % post.pk)
+        self.assertEqual(response.data['results'], [{'user': user.pk, 'post': post.pk, 'active': True,
+                                                     'type_of_like': {'id': like_type.pk, 'name_type': 'like'}}])
+        self.assertEqual(APIClient().get('/likes/').data[0]['user'], user.pk)
+
+
+class CommentThreadTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username='author', is_active=True)
+        self.post = Post.objects.create(title='post', content='content', created_by=self.user,
+                                        type_of_post=PostType.objects.create(name_type='post'))
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def add_comment(self, **data):
+        return self.client.post('/posts/%d/add_comment/' % self.post.pk, {'comment': 'hi', **data}, format='json')
+
+    def test_invalid_parent(self):
+        self.assertEqual(self.add_comment(parent='abc').status_code, 400)
+        self.assertEqual(self.add_comment(parent=999).status_code, 400)
+
+    # danh sách (fastpath) và add_comment/PATCH (CommentSerializer) trả cùng dạng comment
+    def test_list_matches_serializer(self):
+        root = self.add_comment().data
+        reply = self.add_comment(parent=root['id']).data
+        thread = self.client.get('/posts/%d/comments/' % self.post.pk).data['results'][0]
+        self.assertEqual({key: thread[key] for key in root}, {**root, 'reply_count': 1})
+        self.assertEqual(self.client.get('/comments/%d/replies/' % root['id']).data['results'], [reply])
+        self.assertEqual(self.client.patch('/comments/%d/' % reply['id'], {}, format='json').data.keys(), reply.keys())
+
+    # comment ghi bằng bulk_create không có path: xoá nó không được xoá các comment khác của post
+    def test_delete_comment_without_path(self):
+        other = Comment.objects.create(user=self.user, post=self.post, comment='other')
+        bare, = Comment.objects.bulk_create([Comment(user=self.user, post=self.post, comment='bare')])
+        Comment.objects.bulk_create([Comment(user=self.user, post=self.post, comment='reply', parent=bare)])
+        threads.delete_comment(Comment.objects.get(pk=bare.pk))
+        self.assertEqual(list(Comment.objects.values_list('pk', flat=True)), [other.pk])
+
+    # reply_count chỉ đếm reply active, giống preview và /comments/{id}/replies/
+    def test_reply_count_ignores_hidden_replies(self):
+        root = self.add_comment().data['id']
+        reply = self.add_comment(parent=root).data['id']
+        self.client.patch('/comments/%d/' % reply, {'active': False}, format='json')
+        self.assertEqual(Comment.objects.get(pk=root).reply_count, 0)
+        thread = self.client.get('/posts/%d/comments/' % self.post.pk).data['results'][0]
+        self.assertEqual((thread['replies'], thread['replies_next']), ([], None))
+
+        self.client.patch('/comments/%d/' % reply, {'active': True}, format='json')
+        self.assertEqual(Comment.objects.get(pk=root).reply_count, 1)
+        threads.delete_comment(Comment.objects.get(pk=reply))
+        self.assertEqual(Comment.objects.get(pk=root).reply_count, 0)
+
+    # import dùng cùng giới hạn độ sâu với API add_comment
+    @override_settings(COMMENT_MAX_DEPTH=2)
+    def test_import_depth_limit(self):
+        comments = [Comment(pk=pk, parent_id=pk - 1 if pk > 1 else None) for pk in range(1, 3)]
+        threads.assign_imported_paths(comments)
+        self.assertEqual([comment.depth for comment in comments], [0, 1])
+        reply = self.add_comment(parent=self.add_comment().data['id']).data['id']
+        self.assertEqual(self.add_comment(parent=reply).status_code, 400)
+        with self.assertRaises(ValueError):
+            threads.assign_imported_paths(comments + [Comment(pk=3, parent_id=2)])
+
+
+class AdminStatsTests(TestCase):
+    def test_user_stats(self):
+        admin = User.objects.create(username='admin', is_staff=True, is_superuser=True)
+        group = Membership.objects.create(group_name='group')
+        User.objects.create(username='member').membership.add(group)
+        self.client.force_login(admin)
+        today = timezone.localdate()
+        response = self.client.get('/admin/user-stats/', {'start': today, 'end': today + timedelta(days=1),
+                                                          'granularity': 'day', 'breakdown': 'membership'})
+        self.assertEqual([(stat['group'], stat['count']) for stat in response.context['user_stats']],
+                         [(None, 1), ('group', 1)])
+        response = self.client.get('/admin/user-stats/', {'start': today, 'end': today + timedelta(days=1),
+                                                          'breakdown': 'post_type'})
+        self.assertIn('breakdown', response.context['stats_form'].errors)
+
+
+class SearchTests(TestCase):
+    # tiền tố trong q được fold giống token nên khớp không phân biệt hoa thường/dấu
+    def test_prefix_match_is_folded(self):
+        user = User.objects.create(username='author', is_active=True)
+        post = Post.objects.create(title='Học bổng', content='Sinh viên', created_by=user,
+                                   type_of_post=PostType.objects.create(name_type='post'))
+        Post.objects.create(title='other', content='other', created_by=user, type_of_post=post.type_of_post)
+        self.assertEqual([p.pk for p in search.search_posts(Post.objects.all(), 'SINH Viê HOC')], [post.pk])
+
+
+class QueryPlanParserTests(TestCase):
+    def test_problems(self):
+        plan = json.dumps({'query_block': {'ordering_operation': {'using_filesort': True, 'nested_loop': [
+            {'table': {'table_name': 'my_social_media_post', 'access_type': 'ALL'}},
+            {'table': {'table_name': '<derived2>', 'access_type': 'ALL'}},
+            {'table': {'table_name': 'my_social_media_like', 'access_type': 'ref'}},
+        ]}}})
+        self.assertEqual(queryplans.problems(plan), [(queryplans.FILESORT, ''),
+                                                     (queryplans.FULL_SCAN, 'my_social_media_post')])
+
+
+# các queryset nóng của views.py/dao.py dựng y như lúc chạy thật, EXPLAIN từng câu và lỗi khi plan có full scan
+# hoặc filesort. Chỉ chạy trên MySQL/MariaDB (queryplans.explain)
+@skipUnless(connection.vendor == 'mysql', 'query plans are checked on MySQL/MariaDB only')
+class QueryPlanTests(TestCase):
+    # MySQL chọn full scan cho bảng gần rỗng dù có index
+    POSTS = 2000
+    DAYS = 400
+
+    # ANALYZE TABLE commit ngầm nên dữ liệu được ghi và thống kê trước khi TestCase mở transaction bọc class,
+    # xoá đi ở tearDownClass
+    @classmethod
+    def setUpClass(cls):
+        try:
+            cls.create_data()
+        except Exception:
+            cls.delete_data()
+            raise
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        cls.delete_data()
+
+    @classmethod
+    def create_data(cls):
+        post_type = PostType.objects.create(name_type='post')
+        like_types = [LikeType.objects.create(name_type=name) for name in ('like', 'love')]
+        users = [User.objects.create(username='plan%d' % i, is_active=True) for i in range(50)]
+        Post.objects.bulk_create([Post(title='bai viet %d' % i, content='noi dung', type_of_post=post_type,
+                                       created_by=users[i % len(users)]) for i in range(cls.POSTS)])
+        post_ids = list(Post.objects.order_by('pk').values_list('pk', flat=True))
+        # bulk_create ghi đè created_date (auto_now_add) nên rải ngày sau khi ghi
+        start = date.today() - timedelta(days=cls.DAYS)
+        for day in range(cls.DAYS):
+            Post.objects.filter(pk__in=post_ids[day::cls.DAYS]).update(created_date=start + timedelta(days=day))
+
+        Like.objects.bulk_create([Like(user=users[(i + k) % len(users)], post_id=post_id,
+                                       type_of_like=like_types[k % len(like_types)])
+                                  for i, post_id in enumerate(post_ids) for k in range(3)], batch_size=1000)
+        hot = post_ids[-1]
+        Comment.objects.bulk_create([Comment(user=users[i % len(users)], post_id=post_id, comment='binh luan')
+                                     for i, post_id in enumerate(post_ids + [hot] * 300)], batch_size=1000)
+        threads.assign_root_paths(Comment.objects.values_list('pk', flat=True))
+        root = Comment.objects.filter(post_id=hot).order_by('pk').first()
+        for i in range(20):
+            threads.add_comment(users[i % len(users)], hot, 'tra loi', root)
+        UploadJob.objects.bulk_create([UploadJob(user=users[i % len(users)], field='avatar', path='a.png',
+                                                 status=UploadJob.DONE if i % 10 else UploadJob.PENDING)
+                                       for i in range(500)])
+        for name in ('reconcile_counters', 'rebuild_search_index', 'rebuild_timelines', 'rebuild_daily_stats'):
+            call_command(name, stdout=StringIO())
+
+        with connection.cursor() as cursor:
+            for model in (Post, Like, Comment, SearchToken, TimelineEntry, DailyStat, UploadJob, User):
+                cursor.execute('ANALYZE TABLE %s' % connection.ops.quote_name(model._meta.db_table))
+                cursor.fetchall()
+
+    @classmethod
+    def delete_data(cls):
+        for model in (DailyStat, UploadJob, TimelineEntry, SearchToken, PostReaction, Like, Comment, Post, User,
+                      LikeType, PostType):
+            model.objects.all().delete()
+
+    def setUp(self):
+        self.post = Post.objects.filter(active=True).order_by('-comment_count', '-id') \
+            .values('id', 'created_date').first()
+        self.root = Comment.objects.filter(post_id=self.post['id'], depth=0, active=True) \
+            .order_by('-reply_count').values('id', 'post_id', 'path', 'depth').first()
+        self.user = User.objects.get(username='plan0')
+        self.end = date.today()
+        self.start = self.end - timedelta(days=365)
+
+    def assertPlan(self, queryset, allow=()):
+        plan, found = queryplans.explain(queryset)
+        self.assertEqual([problem for problem in found if problem[0] not in allow], [], plan)
+
+    def test_posts(self):
+        self.assertPlan(fastpath.rows(queryplans.page(Post.objects.filter(active=True), PostPaginator),
+                                      fastpath.POSTS))
+
+    def test_posts_next_page(self):
+        self.assertPlan(fastpath.rows(queryplans.page(Post.objects.filter(active=True), PostPaginator,
+                                                      [self.post['created_date'], self.post['id']]), fastpath.POSTS))
+
+    def test_posts_with_viewer(self):
+        viewer = SimpleNamespace(user=self.user)
+        posts = PostDetailsSerializer.annotate_queryset(Post.objects.filter(active=True), viewer)
+        self.assertPlan(fastpath.rows(queryplans.page(posts, PostPaginator), fastpath.POSTS))
+
+    def test_user_posts(self):
+        self.assertPlan(fastpath.rows(queryplans.page(self.user.post_set.filter(active=True), PostPaginator),
+                                      fastpath.POSTS))
+
+    def test_feed(self):
+        self.assertPlan(fastpath.rows(queryplans.page(timeline.feed_queryset(self.user), PostPaginator),
+                                      fastpath.POSTS))
+
+    # sắp theo search_rank tính lúc query
+    def test_search(self):
+        self.assertPlan(search.search_posts(Post.objects.filter(active=True), 'bai')
+                        .order_by(*search.RANKED_ORDERING)[:PostPaginator.page_size + 1], (queryplans.FILESORT,))
+
+    def test_comment_roots(self):
+        roots = Comment.objects.filter(post_id=self.post['id'], depth=0, active=True)
+        self.assertPlan(fastpath.rows(queryplans.page(roots, CommentPaginator), fastpath.COMMENTS))
+
+    # ROW_NUMBER() theo từng thread phải sort trong các thread của trang
+    def test_comment_previews(self):
+        self.assertPlan(threads.reply_preview_queryset(self.post['id'], [self.root], 3), (queryplans.FILESORT,))
+
+    def test_comment_replies(self):
+        self.assertPlan(fastpath.rows(queryplans.page(threads.subtree(self.root), ReplyPaginator),
+                                      fastpath.COMMENTS))
+
+    def test_likes(self):
+        self.assertPlan(fastpath.rows(queryplans.page(Like.objects.filter(post_id=self.post['id']), LikePaginator),
+                                      fastpath.LIKES))
+
+    def test_like_counts(self):
+        self.assertPlan(Like.objects.filter(post_id=self.post['id'], active=True).order_by()
+                        .values('type_of_like').annotate(total=Count('id')))
+
+    # GROUP BY theo kỳ (TruncMonth) phải sort, nhưng chỉ trong khoảng ngày đọc bằng index
+    def test_post_stats(self):
+        self.assertPlan(dao.get_post_stats(self.start, self.end, 'month'), (queryplans.FILESORT,))
+
+    def test_user_stats(self):
+        self.assertPlan(dao.get_user_stats(self.start, self.end, 'month'), (queryplans.FILESORT,))
+
+    def test_posts_by_month(self):
+        self.assertPlan(dao.get_posts_by_month(self.end.year), (queryplans.FILESORT,))
+
+    def test_upload_queue(self):
+        self.assertPlan(UploadJob.objects.filter(status=UploadJob.PENDING).order_by('id')
+                        .values_list('id', flat=True)[:100])
@@ -0,0 +1,174 @@
+from collections import defaultdict
+from django.conf import settings
+from django.db import transaction
+from django.db.models import CharField, Count, F, Q, Value, Window
+from django.db.models.functions import Cast, Concat, LPad, RowNumber, Substr
+from rest_framework.reverse import reverse
+from rest_framework.utils.urls import replace_query_param
+from .models import Comment
+from . import counters, fastpath
+
+# comment dạng cây lưu bằng materialized path: path = path của comment cha + id (10 chữ số) + '/'.
+# sắp theo path là thứ tự hiển thị của thread, cả nhánh con của 1 comment là 1 khoảng path (post, path LIKE 'x%')
+# đọc bằng index comment_thread_idx
+SEGMENT_DIGITS = 10
+SEGMENT_LENGTH = SEGMENT_DIGITS + 1
+
+
+def segment(pk):
+    return '%0*d/' % (SEGMENT_DIGITS, pk)
+
+
+def root_id(path):
+    return int(path[:SEGMENT_DIGITS])
+
+
+# id các comment tổ tiên, không tính chính nó
+def ancestor_ids(path):
+    return [int(path[i:i + SEGMENT_DIGITS]) for i in range(0, len(path) - SEGMENT_LENGTH, SEGMENT_LENGTH)]
+
+
+def max_depth():
+    return getattr(settings, 'COMMENT_MAX_DEPTH', 10)
+
+
+# gọi sau khi insert vì path cần id của comment
+def assign_path(comment):
+    parent = comment.parent
+    comment.depth = parent.depth + 1 if parent else 0
+    comment.path = (parent.path if parent else '') + segment(comment.pk)
+    Comment.objects.filter(pk=comment.pk).update(path=comment.path, depth=comment.depth)
+
+
+# path cho các comment gốc tạo bằng bulk_create (không có post_save), 1 câu UPDATE
+def assign_root_paths(comment_ids):
+    Comment.objects.filter(pk__in=comment_ids).update(
+        depth=0, path=Concat(LPad(Cast('id', CharField()), SEGMENT_DIGITS, Value('0')), Value('/')))
+
+
+# path/depth cho comment nhập từ file (đã có id, không qua post_save): comment cha phải đứng trước reply,
+# cha đã nhập ở đoạn trước thì đọc path từ DB
+def assign_imported_paths(comments):
+    chunk_ids = {comment.pk for comment in comments}
+    outside = {comment.parent_id for comment in comments if comment.parent_id is not None} - chunk_ids
+    known = {pk: (path, depth) for pk, path, depth in
+             Comment.objects.filter(pk__in=outside).values_list('pk', 'path', 'depth')}
+    for comment in comments:
+        if comment.parent_id is None:
+            comment.path, comment.depth = segment(comment.pk), 0
+        else:
+            if comment.parent_id not in known:
+                raise ValueError('parent %s of comment %s must be imported before it' % (comment.parent_id,
+                                                                                         comment.pk))
+            parent_path, parent_depth = known[comment.parent_id]
+            comment.path, comment.depth = parent_path + segment(comment.pk), parent_depth + 1
+            # cùng giới hạn độ sâu với API add_comment
+            if comment.depth >= max_depth() or len(comment.path) > Comment._meta.get_field('path').max_length:
+                raise ValueError('comment %s is nested too deep' % comment.pk)
+        known[comment.pk] = (comment.path, comment.depth)
+
+
+@transaction.atomic
+def add_comment(user, post_id, text, parent=None):
+    comment = Comment.objects.create(user=user, post_id=post_id, comment=text, parent=parent)
+    if parent is not None:
+        Comment.objects.filter(pk__in=ancestor_ids(comment.path)).update(reply_count=F('reply_count') + 1)
+    counters.comments_added(post_id)
+    return comment
+
+
+# comment chưa có path (ghi bằng bulk_create/fixture, không qua post_save): path '' là tiền tố của mọi path trong
+# post nên không lọc theo path được, đi theo parent từng cấp (tối đa max_depth() cấp)
+def _ancestor_ids(comment):
+    if comment.path:
+        return ancestor_ids(comment.path)
+    ids, parent_id = [], comment.parent_id
+    while parent_id is not None:
+        ids.append(parent_id)
+        parent_id = Comment.objects.filter(pk=parent_id).values_list('parent_id', flat=True).first()
+    return ids
+
+
+def _subtree_ids(comment):
+    ids, level = [comment.pk], [comment.pk]
+    while level:
+        level = list(Comment.objects.filter(parent_id__in=level).values_list('pk', flat=True))
+        ids += level
+    return ids
+
+
+# xoá comment cùng cả nhánh reply của nó, cập nhật reply_count của các comment cha và comment_count của post
+# (cả 2 bộ đếm chỉ tính comment active)
+@transaction.atomic
+def delete_comment(comment):
+    if comment.path:
+        subtree = Comment.objects.filter(post_id=comment.post_id, path__startswith=comment.path)
+    else:
+        subtree = Comment.objects.filter(pk__in=_subtree_ids(comment))
+    sizes = subtree.aggregate(total=Count('id'), active=Count('id', filter=Q(active=True)))
+    subtree.delete()
+    if sizes['active']:
+        Comment.objects.filter(pk__in=_ancestor_ids(comment)).update(reply_count=F('reply_count') - sizes['active'])
+        counters.comments_removed(comment.post_id, sizes['active'])
+    return sizes
+
+
+# ẩn/hiện 1 comment (PATCH active): cộng/trừ 1 vào reply_count của các comment cha và comment_count của post
+def active_changed(comment, was_active):
+    if comment.active == was_active:
+        return
+    delta = 1 if comment.active else -1
+    Comment.objects.filter(pk__in=_ancestor_ids(comment)).update(reply_count=F('reply_count') + delta)
+    if comment.active:
+        counters.comments_added(comment.post_id)
+    else:
+        counters.comments_removed(comment.post_id)
+
+
+# các reply (mọi cấp) của comment theo thứ tự thread; depth = số cấp tối đa tính từ comment
+def subtree(comment, depth=None):
+    if not comment['path']:
+        return Comment.objects.filter(parent_id=comment['id'], active=True)
+    replies = Comment.objects.filter(post_id=comment['post_id'], path__startswith=comment['path'], active=True) \
+        .exclude(pk=comment['id'])
+    if depth is not None:
+        replies = replies.filter(depth__lte=comment['depth'] + depth)
+    return replies
+
+
+# N reply đầu tiên của mỗi comment gốc trong trang, 1 query: ROW_NUMBER() theo comment gốc (đầu path)
+def reply_preview_queryset(post_id, roots, limit):
+    in_threads = Q()
+    for root in roots:
+        in_threads |= Q(path__startswith=root['path'])
+    rank = Window(RowNumber(), partition_by=[Substr('path', 1, SEGMENT_LENGTH)], order_by=F('path').asc())
+    return Comment.objects.filter(in_threads, post_id=post_id, active=True, depth__gt=0) \
+        .annotate(reply_rank=rank).filter(reply_rank__lte=limit).order_by('path')
+
+
+def reply_previews(post_id, roots, limit):
+    roots = [root for root in roots if root['path']]
+    if not roots or limit <= 0:
+        return {}
+    previews = defaultdict(list)
+    for row in fastpath.rows(reply_preview_queryset(post_id, roots, limit), fastpath.COMMENTS):
+        previews[root_id(row['path'])].append(row)
+    return previews
+
+
+# trang comment gốc kèm vài reply đầu và link "xem thêm" (replies_next) tới /comments/{id}/replies/
+def build_threads(rows, post_id, request, loader, paginator_class):
+    previews = reply_previews(post_id, rows, getattr(settings, 'COMMENT_REPLY_PREVIEW', 3))
+    reply_rows = [row for replies in previews.values() for row in replies]
+    loader.prime({row['user_id'] for row in reply_rows})
+
+    data = fastpath.COMMENTS.build(rows, loader)
+    for item, row in zip(data, rows):
+        replies = previews.get(row['id'], [])
+        item['replies'] = fastpath.COMMENTS.build(replies, loader)
+        item['replies_next'] = None
+        if row['reply_count'] > len(replies):
+            url = request.build_absolute_uri(reverse('comment-replies', args=[row['id']]))
+            cursor = paginator_class().encode_cursor([replies[-1]['path']]) if replies else None
+            item['replies_next'] = replace_query_param(url, 'cursor', cursor) if cursor else url
+    return data
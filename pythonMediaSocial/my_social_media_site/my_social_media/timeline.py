@@ -0,0 +1,82 @@
+from django.conf import settings
+from django.db.models import Count, Q
+from .models import Post, User, Membership, TimelineEntry
+
+BATCH_SIZE = 1000
+
+
+def max_group_size():
+    return getattr(settings, 'TIMELINE_FANOUT_MAX_GROUP_SIZE', 1000)
+
+
+# (nhóm fan-out, nhóm đọc lúc request) theo Membership.fan_out
+def split_groups(membership_ids):
+    small, large = [], []
+    for pk, fan_out in Membership.objects.filter(pk__in=membership_ids).values_list('pk', 'fan_out'):
+        (small if fan_out else large).append(pk)
+    return small, large
+
+
+# nhóm fan-out có thêm thành viên vượt max_group_size() thì chuyển sang đọc lúc request. Entry đã fan-out
+# của nhóm vẫn giữ: feed lọc Post theo timeline OR nhóm lớn nên không bị trùng, và không bài nào bị thiếu.
+# Chiều ngược lại (nhóm nhỏ đi) chỉ đổi khi rebuild_timelines dựng lại toàn bộ bằng reset_fan_out
+def update_fan_out(membership_ids):
+    crowded = list(Membership.objects.filter(pk__in=membership_ids, fan_out=True)
+                   .annotate(member_count=Count('users')).filter(member_count__gt=max_group_size())
+                   .values_list('pk', flat=True))
+    if crowded:
+        Membership.objects.filter(pk__in=crowded).update(fan_out=False)
+
+
+# tính lại fan_out của mọi nhóm theo số thành viên hiện tại, trả về (nhóm fan-out, nhóm đọc lúc request)
+def reset_fan_out():
+    large = list(Membership.objects.annotate(member_count=Count('users'))
+                 .filter(member_count__gt=max_group_size()).values_list('pk', flat=True))
+    Membership.objects.exclude(pk__in=large).update(fan_out=True)
+    Membership.objects.filter(pk__in=large).update(fan_out=False)
+    return list(Membership.objects.filter(fan_out=True).values_list('pk', flat=True)), large
+
+
+def _insert(pairs):
+    entries = [TimelineEntry(user_id=user_id, post_id=post_id) for user_id, post_id in pairs]
+    TimelineEntry.objects.bulk_create(entries, batch_size=BATCH_SIZE, ignore_conflicts=True)
+
+
+def fan_out_post(post, membership_ids=None):
+    if membership_ids is None:
+        membership_ids = list(post.membership.values_list('pk', flat=True))
+    small, _ = split_groups(membership_ids)
+    user_ids = set(User.objects.filter(membership__in=small).values_list('pk', flat=True))
+    user_ids.add(post.created_by_id)
+    _insert((user_id, post.pk) for user_id in user_ids)
+
+
+# tính lại toàn bộ người nhận của 1 post, dùng khi post bị gỡ khỏi nhóm
+def rebuild_post(post):
+    small, _ = split_groups(post.membership.values_list('pk', flat=True))
+    user_ids = set(User.objects.filter(membership__in=small).values_list('pk', flat=True))
+    user_ids.add(post.created_by_id)
+    TimelineEntry.objects.filter(post=post).exclude(user_id__in=user_ids).delete()
+    _insert((user_id, post.pk) for user_id in user_ids)
+
+
+def backfill_user(user, membership_ids):
+    small, _ = split_groups(membership_ids)
+    post_ids = Post.objects.filter(active=True, membership__in=small).order_by('-created_date', '-id') \
+        .values_list('pk', flat=True).distinct()[:getattr(settings, 'TIMELINE_BACKFILL_SIZE', 200)]
+    _insert((user.pk, post_id) for post_id in post_ids)
+
+
+def prune_user(user):
+    small, _ = split_groups(user.membership.values_list('pk', flat=True))
+    TimelineEntry.objects.filter(user=user).exclude(post__created_by=user) \
+        .exclude(post__membership__in=small).delete()
+
+
+# feed = timeline dựng sẵn + bài của các nhóm lớn đọc trực tiếp lúc request
+def feed_queryset(user):
+    _, large = split_groups(user.membership.values_list('pk', flat=True))
+    condition = Q(pk__in=TimelineEntry.objects.filter(user=user).values('post_id'))
+    if large:
+        condition |= Q(pk__in=Post.membership.through.objects.filter(membership_id__in=large).values('post_id'))
+    return Post.objects.filter(active=True).filter(condition)
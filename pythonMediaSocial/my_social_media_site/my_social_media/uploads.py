@@ -0,0 +1,102 @@
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from cloudinary import uploader
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+from .models import User, UploadJob
+
+logger = logging.getLogger(__name__)
+
+UPLOAD_FIELDS = ('avatar', 'cover_photo')
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+# upload ảnh lên Cloudinary không chạy trong request: file được lưu tạm xuống đĩa, UploadJob ghi lại việc cần làm
+# (bảng này đóng vai broker), rồi lệnh process_uploads (hoặc pool thread trong process) upload và ghi lại
+# CloudinaryField
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=getattr(settings, 'UPLOAD_WORKERS', 4),
+                                           thread_name_prefix='upload')
+        return _executor
+
+
+# file gốc user gửi lên chưa qua Cloudinary nên không lưu trong MEDIA_ROOT (thư mục static được serve công khai)
+def temp_storage():
+    return FileSystemStorage(location=getattr(settings, 'UPLOAD_TEMP_ROOT', settings.BASE_DIR / 'var' / 'uploads'))
+
+
+def schedule(user, field, uploaded_file):
+    name = '%s_%s_%s' % (user.pk, field, os.path.basename(uploaded_file.name))
+    path = temp_storage().save(name, uploaded_file)
+    job = UploadJob.objects.create(user=user, field=field, path=path)
+    # mặc định để worker riêng (process_uploads --loop) lấy job, job vẫn còn khi process web restart
+    if getattr(settings, 'UPLOAD_IN_PROCESS', False):
+        transaction.on_commit(lambda: get_executor().submit(run_job, job.pk))
+    return job
+
+
+# chạy trong thread của pool, không có request cycle nên tự dọn kết nối DB như sau mỗi request
+def run_job(job_id):
+    close_old_connections()
+    try:
+        process(job_id)
+    except Exception:
+        logger.exception('Upload job %s crashed', job_id)
+    finally:
+        close_old_connections()
+
+
+def upload(job):
+    field = User._meta.get_field(job.field)
+    options = {'type': field.type, 'resource_type': field.resource_type}
+    options.update({key: value(job.user) if callable(value) else value for key, value in field.options.items()})
+    with temp_storage().open(job.path, 'rb') as f:
+        return uploader.upload_resource(f, **options)
+
+
+def process(job_id):
+    # chỉ 1 worker chuyển được job từ pending sang running; update() không chạy auto_now nên tự ghi updated_date,
+    # nếu không job chờ lâu trong hàng đợi bị process_uploads coi là running quá hạn ngay khi vừa nhận
+    if not UploadJob.objects.filter(pk=job_id, status=UploadJob.PENDING).update(status=UploadJob.RUNNING,
+                                                                                updated_date=timezone.now()):
+        return None
+    job = UploadJob.objects.select_related('user').get(pk=job_id)
+    max_attempts = getattr(settings, 'UPLOAD_MAX_ATTEMPTS', 3)
+    delay = getattr(settings, 'UPLOAD_RETRY_DELAY', 2)
+
+    while True:
+        job.attempts += 1
+        try:
+            resource = upload(job)
+            break
+        except Exception as exc:
+            job.last_error = '%s: %s' % (type(exc).__name__, exc)
+            if job.attempts >= max_attempts:
+                job.status = UploadJob.FAILED
+                job.save(update_fields=['status', 'attempts', 'last_error', 'updated_date'])
+                logger.warning('Upload job %s failed after %d attempts: %s', job.pk, job.attempts, job.last_error)
+                return job
+            job.save(update_fields=['attempts', 'last_error', 'updated_date'])
+            time.sleep(delay * 2 ** (job.attempts - 1))
+
+    with transaction.atomic():
+        # user đổi ảnh lần nữa trong lúc chờ thì kết quả của job cũ bị bỏ qua
+        if not UploadJob.objects.filter(user_id=job.user_id, field=job.field, pk__gt=job.pk).exists():
+            user = User.objects.select_for_update().get(pk=job.user_id)
+            setattr(user, job.field, resource)
+            user.save(update_fields=[job.field])
+        job.status = UploadJob.DONE
+        job.last_error = ''
+        job.save(update_fields=['status', 'attempts', 'last_error', 'updated_date'])
+    temp_storage().delete(job.path)
+    return job
@@ -1,12 +1,13 @@
 from django.urls import path, re_path, include
 from rest_framework import routers
-from my_social_media import views
+from my_social_media import views, async_views
 from .admin import social_media_admin_site
 from django.contrib import admin
 from adminplus.sites import AdminSitePlus
 
 router = routers.DefaultRouter()
 router.register('liketypes', views.LikeTypeViewSet)
+router.register('posttypes', views.PostTypeViewSet)
 router.register('posts', views.PostViewSet)
 router.register('users', views.UserViewSet)
 router.register('likes', views.LikeViewSet)
@@ -14,6 +15,7 @@ router.register('comments', views.CommentViewSet)
 router.register('surveys', views.SurveyViewSet)
 router.register('questions', views.QuestionViewSet)
 router.register('answers', views.AnswerViewSet)
+router.register('feed', views.FeedViewSet, basename='feed')
 
 admin.sites = AdminSitePlus()
 admin.autodiscover()
@@ -22,5 +24,14 @@ admin.autodiscover()
 urlpatterns = [
     path('', include(router.urls)),
     path('admin/', social_media_admin_site.urls),
+    path('metrics/', views.metrics, name='metrics'),
+    # bản async của các endpoint đọc, dùng khi chạy dưới ASGI
+    path('async/posts/', async_views.post_list, name='async-post-list'),
+    path('async/posts/<int:pk>/', async_views.post_detail, name='async-post-detail'),
+    path('async/posts/<int:pk>/comments/', async_views.post_comments, name='async-post-comments'),
+    path('async/posts/<int:pk>/likes/', async_views.post_likes, name='async-post-likes'),
+    path('async/comments/<int:pk>/replies/', async_views.comment_replies, name='async-comment-replies'),
+    path('async/users/<int:pk>/profile/', async_views.user_profile, name='async-user-profile'),
+    path('async/feed/', async_views.feed, name='async-feed'),
     # (r'^admin', include(admin.site.urls)),
 ]
@@ -1,3 +1,7 @@
+import hmac
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.http import Http404, HttpResponse, HttpResponseForbidden
 from django.shortcuts import render
 from drf_yasg import openapi
 from drf_yasg.utils import swagger_auto_schema
@@ -8,9 +12,45 @@ from rest_framework.response import Response
 from .models import LikeType, Post, Comment, Like, User, Membership, PostType, Survey, Question, Answer
 from .serializers import (LikeTypeSerializer, PostSerializer, CommentSerializer, LikeSerializer,
                           UserSerializer, PostDetailsSerializer, UserProfileSerializer, UserRegisterSerializer,
-                          CommentCreateSerializer, SurveySerializer, QuestionSerializer, AnswerSerializer)
+                          CommentCreateSerializer, SurveySerializer, QuestionSerializer, AnswerSerializer,
+                          SurveyDetailsSerializer, PostTypeSerializer, BatchOperationSerializer)
 from .perms import OwnerPermission
+from .paginators import PostPaginator, CommentPaginator, LikePaginator, ReplyPaginator
+from . import timeline, search, surveys, interactions, fastpath, loaders, threads, profiling
+from .caching import cache_response, model_namespace
+from .registry import like_types
 from django.shortcuts import get_object_or_404
+from django.utils.http import parse_etags
+
+
+def eager_load(serializer_class, queryset, request=None):
+    if hasattr(serializer_class, 'setup_eager_loading'):
+        return serializer_class.setup_eager_loading(queryset, request)
+    return queryset
+
+
+# số đo theo view action (profiling.py) cho Prometheus: scraper gửi "Authorization: Bearer <METRICS_TOKEN>",
+# hoặc staff đã đăng nhập admin
+def metrics(request):
+    token = getattr(settings, 'METRICS_TOKEN', None)
+    header = request.headers.get('Authorization', '')
+    authorized = token and hmac.compare_digest(header.encode('utf-8'), ('Bearer %s' % token).encode('utf-8'))
+    if not authorized and not request.user.is_staff:
+        return HttpResponseForbidden()
+    return HttpResponse(profiling.prometheus(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+# đọc trang bằng values() và dựng dict theo plan trong fastpath.py thay vì ModelSerializer
+def fast_paginated_response(view, paginator_class, queryset, plan):
+    paginator = paginator_class()
+    page = paginator.paginate_queryset(fastpath.rows(queryset, plan), view.request, view=view)
+    return paginator.get_paginated_response(plan.build(page, loaders.get_loader({'request': view.request})))
+
+
+# áp dụng select_related/prefetch_related mà serializer của action khai báo
+class EagerLoadingViewSetMixin:
+    def get_queryset(self):
+        return eager_load(self.get_serializer_class(), super().get_queryset(), self.request)
 
 
 # from my_social_media import serializers
@@ -24,6 +64,7 @@ class UserViewSet(viewsets.ViewSet, generics.ListAPIView, generics.CreateAPIView
         return UserSerializer
 
     @action(detail=True)
+    @cache_response('profile', 300, namespaces=lambda view, kwargs: [model_namespace(User, kwargs['pk'])])
     #  xem profile user
     def profile(self, request, pk=None):
         user = self.get_object()
@@ -33,11 +74,9 @@ class UserViewSet(viewsets.ViewSet, generics.ListAPIView, generics.CreateAPIView
     @action(methods=['get'], detail=True)
     def posts(self, request, pk):
         user = self.get_object()
-        posts = user.post_set.filter(active=True).all()
+        posts = PostDetailsSerializer.annotate_queryset(user.post_set.filter(active=True).all(), request)
 
-        return Response(PostDetailsSerializer(posts, many=True,
-                                              context={'request': request}).data,
-                        status=status.HTTP_200_OK)
+        return fast_paginated_response(self, PostPaginator, posts, fastpath.POSTS)
 
     def get_permissions(self):
         if self.action == 'current_user':
@@ -49,14 +88,15 @@ class UserViewSet(viewsets.ViewSet, generics.ListAPIView, generics.CreateAPIView
         return Response(UserSerializer(request.user).data)
 
 
-class PostViewSet(viewsets.ViewSet, generics.ListAPIView,
+class PostViewSet(EagerLoadingViewSetMixin, viewsets.ViewSet, generics.ListAPIView,
                   generics.RetrieveAPIView, generics.UpdateAPIView, generics.CreateAPIView, generics.DestroyAPIView):
     queryset = Post.objects.filter(active=True).all()
     serializer_class = PostDetailsSerializer
     permission_classes = [OwnerPermission]
+    pagination_class = PostPaginator
 
     def get_permissions(self):
-        if self.action in ['add_comment', 'like', 'unlike', 'update_like', 'create_post']:
+        if self.action in ['add_comment', 'like', 'unlike', 'update_like', 'create_post', 'batch']:
             return [permissions.IsAuthenticated()]
         return [permissions.AllowAny()]
 
@@ -65,108 +105,159 @@ class PostViewSet(viewsets.ViewSet, generics.ListAPIView,
             return PostSerializer
         return PostDetailsSerializer
 
+    # chỉ cache cho khách chưa đăng nhập vì liked/liked_type phụ thuộc người xem
+    @cache_response('post_detail', 60, namespaces=lambda view, kwargs: [model_namespace(Post, kwargs['pk'])],
+                    anonymous_only=True, per_viewer=True)
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+
+    def list(self, request, *args, **kwargs):
+        return fast_paginated_response(self, PostPaginator, self.get_queryset(), fastpath.POSTS)
+
     def get_queryset(self):
-        queries = self.queryset
+        queries = super().get_queryset()
 
         q = self.request.query_params.get("q")
         if q:
-            queries = queries.filter(subject__icontains=q)
+            queries = search.search_posts(queries, q)
         return queries
 
+    # có q thì sắp theo độ liên quan
+    def get_pagination_ordering(self):
+        if self.request.query_params.get("q"):
+            return search.RANKED_ORDERING
+        return None
+
+    # comment gốc mới nhất trước, mỗi comment kèm vài reply đầu và link replies_next để tải thêm
     @action(methods=['get'], detail=True)
     def comments(self, request, pk):
-        post = self.get_object()
-        comment = post.comment_set.filter(active=True).all()
+        post_id = self.get_post_id(pk)
+        comment = Comment.objects.filter(post_id=post_id, depth=0, active=True)
 
-        return Response(CommentSerializer(comment, many=True,
-                                          context={'request': request}).data,
-                        status=status.HTTP_200_OK)
+        paginator = CommentPaginator()
+        page = paginator.paginate_queryset(fastpath.rows(comment, fastpath.COMMENTS), request, view=self)
+        return paginator.get_paginated_response(threads.build_threads(
+            page, post_id, request, loaders.get_loader({'request': request}), ReplyPaginator))
 
     @action(methods=['get'], detail=True)
     def likes(self, request, pk):
-        post = self.get_object()
-        like = post.like_set.filter().all()
+        like = Like.objects.filter(post_id=self.get_post_id(pk))
+
+        return fast_paginated_response(self, LikePaginator, like, fastpath.LIKES)
+
+    # nhiều like/unlike/comment trong 1 request: {"operations": [{"op": "like", "post": 1, "type_of_like": 2},
+    # {"op": "unlike", "post": 3}, {"op": "comment", "post": 1, "comment": "..."}]}
+    @action(methods=['post'], detail=False, url_path='batch')
+    def batch(self, request):
+        operations = request.data.get('operations')
+        max_operations = getattr(settings, 'BATCH_MAX_OPERATIONS', 500)
+        if not isinstance(operations, list) or not operations:
+            return Response({"detail": "operations must be a non-empty list."}, status=status.HTTP_400_BAD_REQUEST)
+        if len(operations) > max_operations:
+            return Response({"detail": "At most %d operations per batch." % max_operations},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        validated, errors = [], {}
+        for index, operation in enumerate(operations):
+            serializer = BatchOperationSerializer(data=operation)
+            if serializer.is_valid():
+                validated.append(serializer.validated_data)
+            else:
+                validated.append(None)
+                errors[index] = serializer.errors
 
-        return Response(LikeSerializer(like, many=True, context={
-            'request': request
-        }).data, status=status.HTTP_200_OK)
+        try:
+            results = interactions.apply_batch(request.user, validated, errors)
+        except IntegrityError:
+            return Response({"detail": "Conflicting concurrent write, retry the batch."},
+                            status=status.HTTP_409_CONFLICT)
+        return Response({"results": results}, status=status.HTTP_200_OK)
 
+    # có "parent" thì là reply cho comment đó (cùng post)
     @action(methods=['post'], detail=True, url_path='add_comment')
     def add_comment(self, request, pk):
-        comment = Comment.objects.create(user=request.user,
-                                         post=self.get_object(), comment=request.data.get('comment'))
-        comment.save()
+        post_id = self.get_post_id(pk)
+        parent = None
+        if request.data.get('parent'):
+            try:
+                parent_id = int(request.data.get('parent'))
+            except (TypeError, ValueError):
+                return Response({"detail": "parent must be a comment id."}, status=status.HTTP_400_BAD_REQUEST)
+            parent = Comment.objects.filter(pk=parent_id, post_id=post_id, active=True).first()
+            if parent is None:
+                return Response({"detail": "parent not found."}, status=status.HTTP_400_BAD_REQUEST)
+            if parent.depth + 1 >= threads.max_depth():
+                return Response({"detail": "Maximum reply depth reached."}, status=status.HTTP_400_BAD_REQUEST)
+
+        comment = threads.add_comment(request.user, post_id, request.data.get('comment'), parent)
         return Response(CommentSerializer(comment, context={
             'request': request
         }).data, status=status.HTTP_201_CREATED)
 
+    # id của post đang active, không cần nạp cả post như get_object
+    def get_post_id(self, pk):
+        return get_object_or_404(Post.objects.filter(active=True).values_list('pk', flat=True), pk=pk)
+
     @action(methods=['post'], detail=True)
     def like(self, request, pk):
-        post = self.get_object()
+        post_id = self.get_post_id(pk)
         type_of_like_id = request.data.get('type_of_like')
 
         # Kiểm tra xem type_of_like có được cung cấp hay không
         if not type_of_like_id:
             return Response({"detail": "type_of_like is required."}, status=status.HTTP_400_BAD_REQUEST)
 
-        # Kiểm tra xem type_of_like có tồn tại hay không
-        try:
-            type_of_like = LikeType.objects.get(id=type_of_like_id)
-        except LikeType.DoesNotExist:
+        # Kiểm tra xem type_of_like có tồn tại hay không (registry trong bộ nhớ, không query)
+        type_of_like = like_types.get(type_of_like_id)
+        if type_of_like is None:
             return Response({"detail": "type_of_like not found."}, status=status.HTTP_400_BAD_REQUEST)
 
-        like, created = Like.objects.get_or_create(user=request.user, post=post,
-                                                   defaults={'type_of_like': type_of_like})
-
-        if not created:
-            like.active = not like.active
-            like.type_of_like = type_of_like  # Cập nhật type_of_like nếu cần
-            like.save()
-
-        return Response(PostDetailsSerializer(post, context={'request': request}).data, status=status.HTTP_200_OK)
+        # chưa like thì tạo, đã có thì đảo active và cập nhật type_of_like
+        like = interactions.set_like(request.user, post_id, type_of_like, toggle=True)
+        return Response(interactions.like_state(like), status=status.HTTP_200_OK)
 
     @action(methods=['patch'], detail=True, url_path='unlike')
     def unlike(self, request, pk):
-        post = self.get_object()
-        user = request.user
+        post_id = self.get_post_id(pk)
 
-        try:
-            like = Like.objects.get(user=user, post=post)
-        except Like.DoesNotExist:
+        like = interactions.set_like(request.user, post_id, active=False, require_existing=True)
+        if like is None:
             return Response({"detail": "Like not found."}, status=status.HTTP_404_NOT_FOUND)
 
-        like.active = False
-        like.save()
-
-        return Response({"detail": "Like deactivated.", "active": like.active}, status=status.HTTP_200_OK)
+        return Response({"detail": "Like deactivated.", "active": like.active, **interactions.like_state(like)},
+                        status=status.HTTP_200_OK)
 
     @action(methods=['patch'], detail=True, url_path='update_like')
     def update_like(self, request, pk):
-        post = self.get_object()
-        user = request.user
+        post_id = self.get_post_id(pk)
         type_of_like_id = request.data.get('type_of_like')
 
         if not type_of_like_id:
             return Response({"detail": "type_of_like is required."}, status=status.HTTP_400_BAD_REQUEST)
 
-        try:
-            type_of_like = LikeType.objects.get(id=type_of_like_id)
-        except LikeType.DoesNotExist:
+        type_of_like = like_types.get(type_of_like_id)
+        if type_of_like is None:
             return Response({"detail": "type_of_like not found."}, status=status.HTTP_400_BAD_REQUEST)
 
-        try:
-            like = Like.objects.get(user=user, post=post)
-        except Like.DoesNotExist:
+        like = interactions.set_like(request.user, post_id, type_of_like, active=True, require_existing=True)
+        if like is None:
             return Response({"detail": "Like not found."}, status=status.HTTP_404_NOT_FOUND)
 
-        if not like.active:
-            like.active = True
+        return Response({"detail": "Like type updated.", **interactions.like_state(like)},
+                        status=status.HTTP_200_OK)
 
-        like.type_of_like = type_of_like
-        like.save()
 
-        return Response({"detail": "Like type updated.", "type_of_like": like.type_of_like.id},
-                        status=status.HTTP_200_OK)
+# home timeline của user đang đăng nhập
+class FeedViewSet(viewsets.ViewSet, generics.ListAPIView):
+    serializer_class = PostDetailsSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    pagination_class = PostPaginator
+
+    def get_queryset(self):
+        return eager_load(PostDetailsSerializer, timeline.feed_queryset(self.request.user), self.request)
+
+    def list(self, request, *args, **kwargs):
+        return fast_paginated_response(self, PostPaginator, self.get_queryset(), fastpath.POSTS)
 
 
 class PostCreateAPIView(viewsets.ViewSet, generics.CreateAPIView):
@@ -181,13 +272,42 @@ class PostCreateAPIView(viewsets.ViewSet, generics.CreateAPIView):
     #     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
-class CommentViewSet(viewsets.ViewSet, generics.DestroyAPIView, generics.UpdateAPIView):
+class CommentViewSet(EagerLoadingViewSetMixin, viewsets.ViewSet, generics.DestroyAPIView, generics.UpdateAPIView):
     queryset = Comment.objects.all()
     serializer_class = CommentSerializer
     permission_classes = [OwnerPermission]
 
+    def get_permissions(self):
+        if self.action == 'replies':
+            return [permissions.AllowAny()]
+        return super().get_permissions()
+
+    # ẩn/hiện comment bằng PATCH active: cập nhật comment_count của post và reply_count của comment cha như khi
+    # xoá. Khoá dòng để 2 request đồng thời không cùng trừ 1 lần đổi trạng thái
+    @transaction.atomic
+    def perform_update(self, serializer):
+        was_active = Comment.objects.select_for_update().filter(pk=serializer.instance.pk) \
+            .values_list('active', flat=True).get()
+        threads.active_changed(serializer.save(), was_active)
+
+    # xoá cả nhánh reply bên dưới
+    def perform_destroy(self, instance):
+        threads.delete_comment(instance)
+
+    # reply mọi cấp theo thứ tự thread, ?depth=1 chỉ lấy reply trực tiếp
+    @action(methods=['get'], detail=True)
+    def replies(self, request, pk):
+        comment = get_object_or_404(Comment.objects.filter(active=True).values('id', 'post_id', 'path', 'depth'),
+                                    pk=pk)
+        try:
+            depth = int(request.query_params['depth'])
+        except (KeyError, ValueError):
+            depth = None
 
-class LikeViewSet(viewsets.ViewSet, generics.ListAPIView):
+        return fast_paginated_response(self, ReplyPaginator, threads.subtree(comment, depth), fastpath.COMMENTS)
+
+
+class LikeViewSet(EagerLoadingViewSetMixin, viewsets.ViewSet, generics.ListAPIView):
     queryset = Like.objects.all()
     serializer_class = LikeSerializer
 
@@ -196,11 +316,28 @@ class LikeTypeViewSet(viewsets.ViewSet, generics.ListAPIView):
     queryset = LikeType.objects.all()
     serializer_class = LikeTypeSerializer
 
+    @cache_response('liketypes', 3600, namespaces=[model_namespace(LikeType)])
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+
+class PostTypeViewSet(viewsets.ViewSet, generics.ListAPIView):
+    queryset = PostType.objects.all()
+    serializer_class = PostTypeSerializer
+
+    @cache_response('posttypes', 3600, namespaces=[model_namespace(PostType)])
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
 
-class SurveyViewSet(viewsets.ViewSet, generics.ListAPIView):
+class SurveyViewSet(EagerLoadingViewSetMixin, viewsets.ViewSet, generics.ListAPIView):
     queryset = Survey.objects.all()
     serializer_class = SurveySerializer
 
+    @cache_response('surveys', 300, namespaces=[model_namespace(Survey)])
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
     @action(methods=['get'], detail=True)
     def get_question(self, request, pk):
         survey = self.get_object()
@@ -210,6 +347,25 @@ class SurveyViewSet(viewsets.ViewSet, generics.ListAPIView):
             'request': request
         }).data, status=status.HTTP_200_OK)
 
+    # survey + question + answer + số phiếu trong 1 request, payload được cache và có ETag
+    @action(methods=['get'], detail=True)
+    def full(self, request, pk):
+        # kiểm tra survey còn tồn tại trước khi so ETag: If-None-Match: * chỉ khớp với resource có thật
+        if not pk.isdigit() or not Survey.objects.filter(pk=pk).exists():
+            raise Http404
+        version = surveys.survey_version(pk)
+        etag = surveys.full_etag(pk, version)
+        if_none_match = parse_etags(request.headers.get('If-None-Match', ''))
+        if etag in if_none_match or '*' in if_none_match:
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+
+        def build():
+            survey = get_object_or_404(eager_load(SurveyDetailsSerializer, Survey.objects.all(), request), pk=pk)
+            return SurveyDetailsSerializer(survey, context={'request': request}).data
+
+        payload = surveys.get_full_payload(pk, version, build)
+        return Response(payload, status=status.HTTP_200_OK, headers={'ETag': etag})
+
 
 class QuestionViewSet(viewsets.ViewSet, generics.UpdateAPIView):
     queryset = Question.objects.all()
@@ -229,10 +385,10 @@ class AnswerViewSet(viewsets.ViewSet, generics.RetrieveUpdateAPIView):
     queryset = Answer.objects.all()
     serializer_class = AnswerSerializer
 
-    @action(detail=True, methods=['patch'])
+    @action(detail=True, methods=['patch'], permission_classes=[permissions.IsAuthenticated])
     def plus_quantity(self, request, pk=None):
         answer = self.get_object()
-        answer.quantity += 1
-        answer.save()
+        surveys.cast_vote(request.user, answer)
+        answer.refresh_from_db(fields=['quantity'])
         serializer = self.get_serializer(answer)
         return Response(serializer.data, status=status.HTTP_200_OK)
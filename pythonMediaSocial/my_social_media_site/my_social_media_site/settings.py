@@ -47,13 +47,28 @@ INSTALLED_APPS = [
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
         'oauth2_provider.contrib.rest_framework.OAuth2Authentication',
-    )
+    ),
+    # orjson nếu có cài (renderers.py), không thì như JSONRenderer mặc định
+    'DEFAULT_RENDERER_CLASSES': (
+        'my_social_media.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
 }
 
+# phân trang keyset (paginators.py): số dòng mặc định và giới hạn ?page_size=
+PAGINATION_PAGE_SIZE = 20
+PAGINATION_MAX_PAGE_SIZE = 100
+
+# nhóm có nhiều thành viên hơn số này thì không fan-out khi đăng bài, feed đọc trực tiếp (timeline.py)
+TIMELINE_FANOUT_MAX_GROUP_SIZE = 1000
+# số bài gần nhất của nhóm được thêm vào timeline khi user vào nhóm
+TIMELINE_BACKFILL_SIZE = 200
+
 CKEDITOR_UPLOAD_PATH = "ckeditor/images/"
 MEDIA_ROOT = '%s/my_social_media/static/' % BASE_DIR
 
 MIDDLEWARE = [
+    'my_social_media.middleware.profiling_middleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -61,6 +76,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'my_social_media.middleware.user_summary_stats_middleware',
 ]
 
 ROOT_URLCONF = 'my_social_media_site.urls'
@@ -96,6 +112,63 @@ DATABASES = {
     }
 }
 
+# Cache
+# mặc định dùng bộ nhớ của process; nhiều worker (gunicorn -w > 1) thì đổi sang Redis/Memcached/FileBasedCache
+# để dùng chung. Với LocMemCache, version của response cache (caching.py) chỉ sống
+# RESPONSE_CACHE_VERSION_TIMEOUT giây (mặc định 30) nên worker khác có thể trả dữ liệu cũ trong khoảng đó
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'social-media-network',
+    }
+}
+
+# thời gian cache (giây) cho từng policy trong caching.py, ghi đè giá trị mặc định trong views.py
+RESPONSE_CACHE_ALIAS = 'default'
+RESPONSE_CACHE_POLICIES = {
+    'liketypes': 3600,
+    'posttypes': 3600,
+    'surveys': 300,
+    'survey_full': 3600,
+    'profile': 300,
+    'post_detail': 60,
+}
+
+# số thao tác tối đa trong 1 request /posts/batch/
+BATCH_MAX_OPERATIONS = 500
+
+# số giây giữ LikeType/PostType trong registry.py trước khi tải lại
+TYPE_REGISTRY_TTL = 300
+
+# số cấp reply tối đa của comment và số reply đầu tiên trả kèm mỗi comment gốc (threads.py)
+COMMENT_MAX_DEPTH = 10
+COMMENT_REPLY_PREVIEW = 3
+
+# số URL ảnh Cloudinary giữ trong cache của process (media.py); kích thước các variant có thể ghi đè bằng IMAGE_VARIANTS
+IMAGE_URL_CACHE_SIZE = 10000
+
+# upload avatar/cover_photo lên Cloudinary chạy nền (uploads.py): số thread, số lần thử, giây chờ trước lần thử lại
+# (nhân đôi sau mỗi lần). file chờ upload được lưu tạm trong UPLOAD_TEMP_ROOT, thư mục không nằm trong
+# MEDIA_ROOT/static nên không bị serve ra ngoài; worker phải đọc được thư mục này.
+# job do worker riêng chạy: manage.py process_uploads --loop 5 (job running của worker chết được lấy lại sau
+# --stale-minutes). UPLOAD_IN_PROCESS = True thì upload luôn bằng thread trong process web (khi dev), job đang chờ
+# lúc process restart vẫn cần process_uploads
+UPLOAD_IN_PROCESS = False
+UPLOAD_WORKERS = 4
+UPLOAD_MAX_ATTEMPTS = 3
+UPLOAD_RETRY_DELAY = 2
+UPLOAD_TEMP_ROOT = BASE_DIR / 'var' / 'uploads'
+
+# số đo theo view action (profiling.py), xem ở /admin/endpoint-stats/ và /metrics/ (Prometheus).
+# request chậm hơn PROFILING_SLOW_MS hoặc nhiều query hơn PROFILING_SLOW_QUERIES thì log danh sách query
+# với xác suất PROFILING_SAMPLE_RATE. METRICS_TOKEN: scraper gửi "Authorization: Bearer <token>", None thì chỉ staff xem
+PROFILING_ENABLED = True
+PROFILING_SLOW_MS = 500
+PROFILING_SLOW_QUERIES = 50
+PROFILING_SAMPLE_RATE = 0.1
+PROFILING_MAX_LOGGED_QUERIES = 200
+METRICS_TOKEN = None
+
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
 